@@ -6,8 +6,10 @@ Fastgame.core.game
 >>> game = FastGame()
 """
 
+import os
 import sys
-from typing import Tuple, Any, Callable
+import time
+from typing import Tuple, Any, Callable, Iterable, Union
 
 import pygame
 from pygame.locals import *
@@ -15,8 +17,14 @@ from pygame.locals import *
 import fastgame
 from fastgame.locals import *
 from fastgame.utils.event import Event
+from fastgame.utils.inputs import InputState
 from fastgame.utils.color import *
 from fastgame.utils import logs
+from fastgame.utils.profiler import Profiler
+from fastgame.utils.music import Playlist, MUSIC_END
+from fastgame.utils.timer import Scheduler, ScheduledCall
+from fastgame.utils.scripts import ScriptRunner
+from fastgame.exceptions import *
 
 __all__ = ['FastGame']
 
@@ -33,10 +41,46 @@ def _pass(*args, **kwargs):
     return args, kwargs
 
 
+_VIEW_EVENTS = {ON_MOUSE_DOWN: MOUSEBUTTONDOWN, ON_MOUSE_UP: MOUSEBUTTONUP, ON_MOUSE_MOVE: MOUSEMOTION,
+                ON_KEY_DOWN: KEYDOWN, ON_KEY_UP: KEYUP}
+# 没有回调函数时也放入事件队列的事件：退出、输入状态需要的输入事件和窗口事件
+_ALLOWED_EVENTS = [QUIT, KEYDOWN, KEYUP, MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEWHEEL,
+                   ACTIVEEVENT, VIDEORESIZE, VIDEOEXPOSE] + \
+                  [getattr(pygame, name) for name in dir(pygame)
+                   if name.startswith('WINDOW') and not name.startswith('WINDOWPOS')]
+
+
+def _coalesce(previous: pygame.event.Event, event: pygame.event.Event):
+    # 合并同一帧中的两个事件，MOUSEMOTION的rel为总移动
+    if previous is None or event.type != MOUSEMOTION:
+        return event
+    rel = (previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1])
+    return pygame.event.Event(MOUSEMOTION, dict(event.dict, rel=rel))
+
+
+_MAX_DAMAGE_RECTS = 64  # 脏矩形超过此数量时整体重绘
+_FULL_REDRAW_AREA = 0.5  # 脏矩形的总面积超过窗口面积的此比例时整体重绘
+
+
+def _merge_rects(rects):
+    # 合并相交的脏矩形，保证结果两两不相交，避免带透明度的图片被重复绘制
+    merged = []
+    for rect in rects:
+        if not (rect.width and rect.height):
+            continue
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
 class FastGame(object):
     def __init__(self, title: str = 'Fast Game Window', size: Tuple[int, int] = (500, 500),
                  style: int = NORMAL, depth: int = 0, icon: str = None, fps: int = 16,
-                 debug_messages: bool = False, init_pygame: bool = True):
+                 debug_messages: bool = False, init_pygame: bool = True, headless: bool = False):
         """
         主要的fastgame游戏基类。
         使用FastGame()创建游戏。
@@ -54,7 +98,12 @@ class FastGame(object):
         :param fps: 窗口FPS，即每秒刷新帧数。
         :param debug_messages: 是否显示调试信息。
         :param init_pygame: 是否初始化pygame2。
+        :param headless: 是否使用无窗口模式，用于服务器、CI和性能测试，需要在初始化pygame2前设置。
         """
+        self.headless = headless
+        if headless:  # 使用SDL的dummy驱动，不需要显示器和声卡
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         if init_pygame:
             _init_pygame()
         self.width, self.height = size
@@ -69,14 +118,45 @@ class FastGame(object):
             pygame.display.set_icon(self.icon)  # set favicon
             
         self._views = {}
+        self._handlers = {}  # 事件类型 -> (每个事件调用的回调函数, 每帧调用一次的回调函数)
+        self._builtins = set()  # 内置的回调函数，总是在用户的回调函数之后调用
+        self.filter_events = True  # 主循环中是否让SDL丢弃没有回调函数的事件
+        self._filtering = False
+        self._allowed = None  # SDL放入事件队列的事件类型
+        self._status = 0
+        self._escape_quit = False
         self._debug = debug_messages
         self.on_draw = self.update
+        self.scripts = ScriptRunner(on_wait_event=lambda event_type: self._update_filter())  # 正在运行的脚本
         
-        self.event = Event()
+        self.event = Event()  # 正在处理的事件
+        self.input = InputState()  # 这一帧的输入状态
         self.clock = pygame.time.Clock()
         self.fps = fps
         self.counter = 0
         
+        self.logic_fps = None  # 固定步长模式下，每秒逻辑步数
+        self.max_steps = 5  # 每帧最多追赶的逻辑步数
+        self.steps = 0  # 已运行的逻辑步数
+        self.alpha = 0.0  # 渲染插值系数
+        self._accumulator = 0.0
+        self._last_time = 0.0
+        self._fixed_clock = False  # 每帧恰好运行一个逻辑步
+        self.profiler = None
+        self.scheduler = Scheduler()  # after和every使用的调度器
+        
+        self._render_all = True  # 进入mainloop前直接绘制
+        self._started = False  # 是否已经进入过主循环
+        self._draws = []  # 本帧的绘制记录
+        self._last_draws = None  # 上一帧的绘制记录，None表示需要整体重绘
+        self._damage = []  # 手动标记的脏矩形
+        self.input_first = False  # 先处理输入再更新
+        self._latched = set()  # 这一帧延迟锁定鼠标位置的组件
+        self._late = []  # 延迟锁定组件的绘制记录
+        
+        self._add_handler(QUIT, self._on_quit, builtin=True)
+        self._add_handler(KEYDOWN, self._on_escape, builtin=True)
+        self._add_handler(MUSIC_END, self._on_music_end, builtin=True)
         fastgame.games.append(self)
             
     def __getitem__(self, item: str):
@@ -85,11 +165,119 @@ class FastGame(object):
         return self._views[item]
         
     def __setitem__(self, key: str, value: Any):
-        self._views[key] = value
+        self._set_view(key, value)
+        
+    def _set_view(self, name: str, view_func: Callable):
+        # 设置回调函数，事件回调函数同时替换事件表中原来的回调函数
+        old = self._views.get(name)
+        self._views[name] = view_func
+        event_type = _VIEW_EVENTS.get(name)
+        if event_type is not None:
+            if old is not None:
+                self.off(event_type, old)
+            self._add_handler(event_type, view_func)
+            
+    def _add_handler(self, event_type: int, view_func: Callable, coalesce: bool = False,
+                     builtin: bool = False):
+        every, once = self._handlers.setdefault(event_type, ([], []))
+        handlers = once if coalesce else every
+        if builtin:
+            self._builtins.add(view_func)
+            handlers.append(view_func)
+        else:
+            position = len(handlers)
+            while position and handlers[position - 1] in self._builtins:
+                position -= 1
+            handlers.insert(position, view_func)
+        self._update_filter()
+        
+    def on(self, event_type: int, coalesce: bool = False):
+        """
+        装饰器，装饰某种pygame事件的回调函数，支持任意事件类型(如VIDEORESIZE、JOYAXISMOTION、USEREVENT)。
+        同一种事件可以有多个回调函数，按装饰的顺序调用，回调函数通过FastGame.event取得事件。
+        主循环中，只有有回调函数的事件和输入状态需要的事件才会被SDL放入事件队列。
+        
+        >>> @game.on(VIDEORESIZE)
+        >>> def resize():
+        >>>     print(game.event['size'])
+        
+        :param event_type: pygame事件类型。
+        :param coalesce: 是否每帧最多调用一次，此时FastGame.event为这一帧最后一个此类事件，
+                         MOUSEMOTION的rel为这一帧的总移动。
+        :return: 装饰器。
+        :rtype: Callable
+        """
+        def decorator(view_func: Callable):
+            self._add_handler(event_type, view_func, coalesce)
+            return view_func
+        
+        return decorator
+    
+    def off(self, event_type: int, view_func: Callable):
+        """
+        移除某种pygame事件的回调函数。
+        
+        :param event_type: pygame事件类型。
+        :param view_func: 回调函数。
+        """
+        entry = self._handlers.get(event_type)
+        if entry is None:
+            return
+        for handlers in entry:
+            if view_func in handlers:
+                handlers.remove(view_func)
+        if not (entry[0] or entry[1]):
+            del self._handlers[event_type]
+        self._update_filter()
+        
+    def _update_filter(self):
+        # 只让SDL把需要的事件放入事件队列
+        if not self._filtering:
+            if self._allowed is not None:  # 关闭过滤
+                pygame.event.set_allowed(None)
+                self._allowed = None
+            return
+        allowed = set(_ALLOWED_EVENTS).union(self._handlers, self.scripts.event_types)
+        if self._allowed is None:
+            # set_blocked会清除队列中被阻止类型的事件，先取出队列，设置后放回需要的事件
+            pending = pygame.event.get()
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(list(allowed))
+            for event in pending:
+                if event.type in allowed:
+                    pygame.event.post(event)
+        else:  # 只改变变化的类型，set_blocked会清除队列中此类型的事件
+            added = allowed - self._allowed
+            removed = self._allowed - allowed
+            if added:
+                pygame.event.set_allowed(list(added))
+            if removed:
+                pygame.event.set_blocked(list(removed))
+        self._allowed = allowed
+        
+    def _on_quit(self):
+        self.destroy(self._status)
+        
+    def _on_escape(self):
+        if self.event['key'] == K_ESCAPE:
+            if self._debug:
+                logs.info('Press ESC')
+            if self._escape_quit:
+                self.destroy(self._status)
+                
+    @staticmethod
+    def _on_music_end():
+        if Playlist.active is not None:
+            Playlist.active.on_end()
     
     @property
     def mouse_position(self):
-        return pygame.mouse.get_pos()
+        """
+        这一帧取得事件时的鼠标位置，见FastGame.input。
+        
+        :rtype: Tuple[int, int]
+        """
+        return self.input.mouse_pos
     
     @mouse_position.setter
     def mouse_position(self, mouse_position: Tuple[int, int]):
@@ -154,6 +342,68 @@ class FastGame(object):
         :rtype: bool
         """
         return self.counter % rate == 0
+    
+    def after(self, ms: Union[int, float], callback: Callable, *args):
+        """
+        在一段时间后调用一次回调函数，不会阻塞主循环。
+        主循环每帧在更新之前调用已到期的回调函数。
+        
+        >>> game.after(500, print, '0.5秒后')
+        
+        :param ms: 延迟，单位为毫秒。
+        :param callback: 回调函数。
+        :param args: 回调函数的参数。
+        :return: 此次调用，可以传入FastGame.cancel取消。
+        :rtype: ScheduledCall
+        """
+        return self.scheduler.after(ms, callback, *args)
+    
+    def every(self, ms: Union[int, float], callback: Callable, *args):
+        """
+        每隔一段时间调用一次回调函数，直到被取消，不会阻塞主循环。
+        比每帧检查check_rate更准确：周期与帧率无关。
+        
+        >>> spawn = game.every(1000, add_enemy)
+        >>> game.cancel(spawn)
+        
+        :param ms: 周期，单位为毫秒。
+        :param callback: 回调函数。
+        :param args: 回调函数的参数。
+        :return: 此次调用，可以传入FastGame.cancel取消。
+        :rtype: ScheduledCall
+        """
+        return self.scheduler.every(ms, callback, *args)
+    
+    def cancel(self, call: ScheduledCall):
+        """
+        取消after或every安排的调用。
+        
+        :param call: after或every返回的调用。
+        """
+        self.scheduler.cancel(call)
+        
+    def script(self, script: Any, *args):
+        """
+        启动脚本，脚本从下一帧开始运行，见fastgame.utils.scripts。
+        可以传入生成器或生成器函数(使用args调用)，也可以作为装饰器。
+        脚本每次yield一个等待条件：None(下一帧)、秒数、scripts.frames(n)、scripts.event(事件类型)
+        或另一个脚本(等待其结束)。
+        
+        >>> @game.script
+        >>> def intro():
+        >>>     label.show()
+        >>>     yield 2
+        >>>     e = yield scripts.event(KEYDOWN)
+        >>>     label.hide()
+        
+        :param script: 生成器或生成器函数。
+        :param args: 生成器函数的参数。
+        :return: 脚本，可以调用stop停止。
+        :rtype: Script
+        """
+        if callable(script):
+            script = script(*args)
+        return self.scripts.start(script)
         
     def destroy(self, status: int = 0, close_program: bool = True, *args, **kwargs):
         """
@@ -165,6 +415,8 @@ class FastGame(object):
         """
         if self._debug:
             logs.info('Quiting...')
+        if self.profiler is not None and self.profiler.dump_file:
+            self.profiler.dump()
         pygame.quit()
         del self.window
         self._views.get(WHEN_END, _pass)(*args, **kwargs)  # 调用WHEN-END函数。
@@ -190,6 +442,31 @@ class FastGame(object):
         """
         pygame.display.toggle_fullscreen()
         
+    def enable_profiler(self, size: int = 600, overlay: bool = False, dump_file: str = None):
+        """
+        开启帧耗时分析，记录主循环每个阶段的耗时。
+        
+        >>> from fastgame import FastGame
+        >>> game = FastGame()
+        >>> profiler = game.enable_profiler(dump_file='profile.json')
+        >>> game.mainloop()
+        >>> print(profiler.percentiles('update'))
+        
+        :param size: 每个阶段保存的最近记录数。
+        :param overlay: 是否在窗口左上角显示帧耗时。
+        :param dump_file: 关闭窗口时保存统计信息的JSON文件路径。
+        :return: 帧耗时分析器。
+        :rtype: Profiler
+        """
+        self.profiler = Profiler(size, overlay, dump_file)
+        return self.profiler
+    
+    def disable_profiler(self):
+        """
+        关闭帧耗时分析。
+        """
+        self.profiler = None
+        
     def get_counter(self):
         """
         获取当前循环次数。
@@ -237,7 +514,7 @@ class FastGame(object):
         :return: 此函数。
         :rtype: Callable
         """
-        self._views[ON_MOUSE_DOWN] = view_func
+        self._set_view(ON_MOUSE_DOWN, view_func)
         return view_func
     
     def on_mouse_up(self, view_func: Callable):
@@ -248,7 +525,7 @@ class FastGame(object):
         :return: 此函数。
         :rtype: Callable
         """
-        self._views[ON_MOUSE_UP] = view_func
+        self._set_view(ON_MOUSE_UP, view_func)
         return view_func
     
     def on_mouse_move(self, view_func: Callable):
@@ -259,7 +536,7 @@ class FastGame(object):
         :return: 此函数。
         :rtype: Callable
         """
-        self._views[ON_MOUSE_MOVE] = view_func
+        self._set_view(ON_MOUSE_MOVE, view_func)
         return view_func
     
     def on_key_down(self, view_func: Callable):
@@ -270,7 +547,7 @@ class FastGame(object):
         :return: 此函数。
         :rtype: Callable
         """
-        self._views[ON_KEY_DOWN] = view_func
+        self._set_view(ON_KEY_DOWN, view_func)
         return view_func
     
     def on_key_up(self, view_func: Callable):
@@ -281,7 +558,7 @@ class FastGame(object):
         :return: 此函数。
         :rtype: Callable
         """
-        self._views[ON_KEY_UP] = view_func
+        self._set_view(ON_KEY_UP, view_func)
         return view_func
 
     def update(self, view_func: Callable):
@@ -295,6 +572,53 @@ class FastGame(object):
         self._views[UPDATE] = view_func
         return view_func
 
+    def fixed_update(self, view_func: Callable):
+        """
+        装饰器，装饰固定步长模式下的逻辑回调函数。
+        回调函数接受一个参数，为每一逻辑步的时长(秒)。
+        
+        >>> from fastgame import FastGame
+        >>> game = FastGame()
+        >>> @game.fixed_update
+        >>> def fixed_update(dt):
+        >>>     player.x += player.speed * dt
+        >>> @game.update
+        >>> def update():
+        >>>     player.draw(game.alpha)
+        >>> game.mainloop(logic_fps=60)
+
+        :param view_func: 逻辑回调函数。
+        :return: 此函数。
+        :rtype: Callable
+        """
+        self._views[FIXED_UPDATE] = view_func
+        return view_func
+
+    def _run_update(self):
+        # 固定步长模式下，先按经过的时间运行逻辑步，更新插值系数后调用UPDATE
+        if not self.logic_fps:
+            self._views.get(UPDATE, _pass)()
+            return
+        step = 1 / self.logic_fps
+        if self._fixed_clock:
+            self._accumulator += step
+        else:
+            now = time.perf_counter()
+            self._accumulator += now - self._last_time
+            self._last_time = now
+        fixed = self._views.get(FIXED_UPDATE, _pass)
+        steps = 0
+        while self._accumulator >= step:
+            if steps >= self.max_steps:  # 追赶不上时丢弃积压的时间，而不是越来越慢
+                self._accumulator %= step
+                break
+            fixed(step)
+            self._accumulator -= step
+            self.steps += 1
+            steps += 1
+        self.alpha = self._accumulator / step
+        self._views.get(UPDATE, _pass)()
+
     def tick_fps(self):
         """
         控制游戏速度。
@@ -307,62 +631,408 @@ class FastGame(object):
         绘制窗口图像。
         """
         pygame.display.flip()
+        
+    def blit(self, owner: Any, image: Any, rect: pygame.Rect):
+        """
+        将组件的图像绘制到窗口上。
+        全部绘制模式下立即绘制；差量绘制模式下记录此次绘制，帧末只重绘变化部分。
+        底层接口，一般由组件的update方法调用。
+        
+        :param owner: 绘制此图像的组件。
+        :param image: 图像，Surface或带有paint方法的组件的绘制记录。
+        :param rect: 绘制位置，调用后不应再修改。
+        """
+        if self._latched and owner in self._latched:  # 推迟到显示前绘制
+            self._late.append((owner, image, rect))
+        elif self._render_all:
+            if isinstance(image, pygame.Surface):
+                self.window.blit(image, rect)
+            else:
+                owner.paint(image, rect)
+        else:
+            self._draws.append((owner, image, rect))
+            
+    def blits(self, owners: Iterable[Any]):
+        """
+        批量绘制组件，只调用一次Surface.blits(或Surface.fblits)。
+        组件需要有image和rect属性。
+        底层接口，一般由Group.update调用。
+        
+        :param owners: 需要绘制的组件，按绘制顺序排列。
+        """
+        if self._latched:
+            owners = list(owners)
+            self._late.extend((owner, owner.image, owner.rect.copy()) for owner in owners if owner in self._latched)
+            owners = [owner for owner in owners if owner not in self._latched]
+        if self._render_all:
+            sequence = [(owner.image, owner.rect) for owner in owners]
+            if hasattr(self.window, 'fblits'):  # pygame-ce
+                self.window.fblits(sequence)
+            else:
+                self.window.blits(sequence, False)
+        else:
+            self._draws.extend([(owner, owner.image, owner.rect.copy()) for owner in owners])
+            
+    def late_latch(self, owner: Any):
+        """
+        这一帧显示前，再取得一次鼠标位置，将组件移动到此位置后绘制(延迟锁定)。
+        跟随鼠标的组件因此比update中取得的位置少一帧延迟，并绘制在其他组件之上。
+        每帧需要重新调用，一般由Sprite.move_to_mouse调用。
+        
+        :param owner: 需要延迟锁定的组件，需要有rect属性。
+        """
+        self._latched.add(owner)
+        
+    def _latch(self):
+        # 显示前取得最新的鼠标位置，移动并绘制延迟锁定的组件
+        late, self._late = self._late, []
+        self._latched.clear()
+        if not late:
+            return
+        pygame.event.pump()  # 更新SDL的鼠标状态，事件留在队列中给下一帧
+        position = pygame.mouse.get_pos()
+        for owner, image, rect in late:
+            rect.topleft = owner.rect.topleft = position
+            moved = getattr(owner, '_moved', None)
+            if moved is not None:
+                moved()
+            self.blit(owner, image, rect)
+        
+    def mark_dirty(self, *rects: pygame.Rect):
+        """
+        手动标记窗口中需要重绘的区域。
+        直接在self.window上绘制时，差量绘制模式需要在绘制后调用此方法。
+        标记区域中直接绘制的内容作为这一帧的背景保留，组件绘制在其上方。
+        不传入参数时，标记整个窗口。
+        
+        :param rects: 需要重绘的矩形。
+        """
+        if not rects:
+            rects = [self.window.get_rect()]
+        self._damage.extend(pygame.Rect(rect) for rect in rects)
+        
+    def _flush_dirty(self):
+        # 对比两帧的绘制记录，恢复变化区域的背景并重绘，返回需要更新的矩形
+        draws, self._draws = self._draws, []
+        marked, self._damage = self._damage, []
+        damage = list(marked)
+        last = self._last_draws
+        current = {}
+        for owner, image, rect in draws:
+            key = (id(owner), 0)
+            while key in current:  # 同一组件在一帧中被绘制多次
+                key = (key[0], key[1] + 1)
+            current[key] = (owner, image, rect)
+            if last is None:
+                continue
+            prev = last.pop(key, None)
+            if prev is None:
+                damage.append(rect)
+            elif (prev[1] is not image and prev[1] != image) or prev[2] != rect:
+                damage.append(prev[2])
+                damage.append(rect)
+        screen_rect = self.window.get_rect()
+        self._last_draws = current
+        # 保留手动标记区域中直接绘制的内容，填充背景后恢复
+        kept = [(self.window.subsurface(rect).copy(), rect)
+                for rect in (rect.clip(screen_rect) for rect in marked) if rect.width and rect.height]
+        full = last is None
+        if not full:
+            damage.extend(prev[2] for prev in last.values())  # 消失的组件
+            damage = [rect.clip(screen_rect) for rect in damage]
+            # 变化太多时，合并和裁剪脏矩形比整体重绘更慢
+            full = (len(damage) > _MAX_DAMAGE_RECTS or sum(rect.width * rect.height for rect in damage)
+                    > screen_rect.width * screen_rect.height * _FULL_REDRAW_AREA)
+        if full:
+            self.window.fill(WHITE)
+            if kept:
+                self.window.blits(kept, False)
+            self._redraw(draws)
+            return [screen_rect]
+        damage = _merge_rects(damage)
+        if not damage:
+            return damage
+        
+        for area in damage:
+            self.window.fill(WHITE, area)
+        if kept:
+            self.window.blits(kept, False)
+        bounds = damage[0].unionall(damage[1:])
+        blits = []
+        for owner, image, rect in draws:
+            if not bounds.colliderect(rect):
+                continue
+            for index in rect.collidelistall(damage):
+                clip = rect.clip(damage[index])
+                if isinstance(image, pygame.Surface):
+                    blits.append((image, clip, clip.move(-rect.x, -rect.y)))
+                else:
+                    if blits:  # 保持绘制顺序
+                        self.window.blits(blits, False)
+                        blits = []
+                    self.window.set_clip(clip)
+                    owner.paint(image, rect)
+                    self.window.set_clip(None)
+        if blits:
+            self.window.blits(blits, False)
+        return damage
+    
+    def _redraw(self, draws: list):
+        # 按顺序完整地绘制所有绘制记录
+        blits = []
+        for owner, image, rect in draws:
+            if isinstance(image, pygame.Surface):
+                blits.append((image, rect))
+            else:
+                if blits:  # 保持绘制顺序
+                    self.window.blits(blits, False)
+                    blits = []
+                owner.paint(image, rect)
+        if blits:
+            self.window.blits(blits, False)
+    
+    def _start(self, render_all: bool, logic_fps: int, max_steps: int, input_first: bool = False,
+               start_hooks: bool = True):
+        # 进入主循环前的准备
+        if start_hooks:
+            self._views.get(WHEN_START, _pass)()
+        self._started = True
+        if self._debug:
+            logs.info('Starting...')
+        self._filtering = self.filter_events
+        self._update_filter()
+        self.counter = 0
+        self._render_all = render_all
+        self._last_draws = None
+        self.logic_fps = logic_fps
+        self.max_steps = max_steps
+        self.input_first = input_first
+        self._accumulator = 0.0
+        self._last_time = time.perf_counter()
+        
+    def _frame(self, status: int, escape_quit: bool):
+        # 运行一帧：更新、处理事件、显示；输入优先模式下先处理事件再更新
+        profiler = self.profiler
+        self.counter += 1
+        if self.input_first:
+            self._process_events(status, escape_quit)
+        if self._render_all:
+            self.window.fill(WHITE)  # 必须fill，否则有重影
+            if profiler is not None:
+                profiler.mark('fill')
+        if self.scheduler.run() and profiler is not None:
+            profiler.mark('timers')
+        if self.scripts.run() and profiler is not None:
+            profiler.mark('scripts')
+        self._run_update()
+        if profiler is not None:
+            profiler.mark('update')
+        if not self.input_first:
+            self._process_events(status, escape_quit)
+        if Playlist.active is not None:
+            Playlist.active.update()
+        if profiler is not None and profiler.overlay:
+            profiler.draw()
+            profiler.mark('overlay')
+        if self._late:
+            self._latch()
+            if profiler is not None:
+                profiler.mark('latch')
+        else:
+            self._latched.clear()
+        if self._render_all:
+            pygame.display.flip()  # 封装pygame2 API
+        else:
+            dirty = self._flush_dirty()
+            if dirty:
+                pygame.display.update(dirty)
+        if profiler is not None:
+            profiler.mark('display')
+            
+    def _process_events(self, status: int, escape_quit: bool):
+        # 取出事件队列，更新输入状态并调用回调函数
+        profiler = self.profiler
+        events = pygame.event.get()
+        self.input = InputState(events, self.counter)
+        if profiler is not None:
+            profiler.mark('events')
+        self._status = status
+        self._escape_quit = escape_quit
+        table = self._handlers
+        waiting = self.scripts.waiting
+        coalesced = None
+        for event in events:
+            if waiting and event.type in waiting:  # 唤醒等待此事件的脚本
+                self.scripts.dispatch(event)
+            entry = table.get(event.type)
+            if entry is None:  # 没有回调函数
+                continue
+            self.event = Event(event)
+            if self._debug:
+                logs.debug(f'Event: {pygame.event.event_name(event.type)}')
+            for handler in tuple(entry[0]):  # 回调函数中可能调用off
+                handler()
+            if entry[1]:
+                if coalesced is None:
+                    coalesced = {}
+                coalesced[event.type] = _coalesce(coalesced.get(event.type), event)
+            if profiler is not None:
+                profiler.mark('event:' + pygame.event.event_name(event.type))
+        if coalesced:
+            for event_type, event in coalesced.items():
+                entry = table.get(event_type)
+                if entry is None:  # 回调函数在这一帧中被移除
+                    continue
+                self.event = Event(event)
+                for handler in tuple(entry[1]):
+                    handler()
+            if profiler is not None:
+                profiler.mark('event:coalesced')
     
     def mainloop(self, status: int = 0, escape_quit: bool = False, render_all: bool = False,
-                 fps_mode=BEFORE):
+                 fps_mode=BEFORE, logic_fps: int = None, max_steps: int = 5, input_first: bool = False):
         """
         进入窗口显示的主循环。
         会阻塞程序的运行。
         
+        指定logic_fps时进入固定步长模式：被fixed_update装饰的函数以固定的时长运行，
+        与渲染帧率无关；被update装饰的函数仍然每帧调用一次，可以从FastGame.alpha取得插值系数(0~1)，
+        即距下一逻辑步的进度。渲染变慢时丢帧，而不是让游戏变慢。
+        
+        默认每帧先更新再处理事件，update中看到的是上一帧取得的输入；
+        input_first为True时先处理事件，再更新和显示，输入到显示的延迟少一帧。
+        
         :param status: 程序退出状态码。
         :param escape_quit: 按下ESC键时，是否退出。
         :param render_all: 刷新窗口是否全部绘制，默认只绘制变化部分。
         :param fps_mode: 控制FPS的位置。
+        :param logic_fps: 固定步长模式下，每秒逻辑步数。
+        :param max_steps: 固定步长模式下，每帧最多追赶的逻辑步数。
+        :param input_first: 是否先处理事件再更新。
         """
-        self._views.get(WHEN_START, _pass)()
-        if self._debug:
-            logs.info('Starting...')
-        self.counter = 0
+        self._start(render_all, logic_fps, max_steps, input_first)
         while True:
-            self.counter += 1
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.start_frame()
             if fps_mode == BEFORE:
                 self.tick_fps()
-            self.window.fill(WHITE)  # 必须fill，否则有重影
-            self._views.get(UPDATE, _pass)()
-            for event in pygame.event.get():
-                self.event = Event(event)
-                if event.type == QUIT:
-                    self.destroy(status)
-                elif event.type == MOUSEBUTTONDOWN:
-                    if self._debug:
-                        logs.debug('Mouse button down')
-                    self._views.get(ON_MOUSE_DOWN, _pass)()
-                elif event.type == MOUSEBUTTONUP:
-                    if self._debug:
-                        logs.debug('Mouse button up')
-                    self._views.get(ON_MOUSE_UP, _pass)()
-                elif event.type == MOUSEMOTION:
-                    if self._debug:
-                        logs.debug('Mouse is moving')
-                    self._views.get(ON_MOUSE_MOVE, _pass)()
-                elif event.type == KEYDOWN:
-                    if self._debug:
-                        logs.debug('A key down')
-                    self._views.get(ON_KEY_DOWN, _pass)()
-                    if event.key == K_ESCAPE:
-                        if self._debug:
-                            logs.info('Press ESC')
-                        if escape_quit:
-                            self.destroy(status)
-                elif event.type == KEYUP:
-                    if self._debug:
-                        logs.debug('A key up')
-                    self._views.get(ON_KEY_UP, _pass)()
-                    
-            if render_all:
-                pygame.display.flip()  # 封装pygame2 API
-            else:
-                pygame.display.update()
-                
+                if profiler is not None:
+                    profiler.mark('tick')
+            self._frame(status, escape_quit)
             if fps_mode == AFTER:
                 self.tick_fps()
+                if profiler is not None:
+                    profiler.mark('tick')
+            if profiler is not None:
+                profiler.end_frame()
+                
+    def run(self, frames: int = None, until: Callable[[], bool] = None, render_all: bool = False,
+            logic_fps: int = None, input_first: bool = False):
+        """
+        不限制FPS，尽可能快地运行若干帧，然后返回统计信息。
+        常与无窗口模式一起用于服务器、CI和性能测试。
+        
+        >>> from fastgame import FastGame
+        >>> game = FastGame(headless=True)
+        >>> stats = game.run(1000)
+        >>> print(stats['fps'])
+        
+        指定logic_fps时，每帧恰好运行一个逻辑步，结果与机器速度无关。
+        
+        :param frames: 运行的帧数。
+        :param until: 每帧结束后调用，返回True时停止运行。
+        :param render_all: 刷新窗口是否全部绘制，默认只绘制变化部分。
+        :param logic_fps: 固定步长模式下，每秒逻辑步数。
+        :param input_first: 是否先处理事件再更新。
+        :return: 统计信息，包括帧数frames、总耗时time(秒)、平均帧率fps和每帧耗时frame_times(秒)。
+        :rtype: dict
+        """
+        if frames is None and until is None:
+            raise FastGameError('frames or until must be given')
+        self._start(render_all, logic_fps, self.max_steps, input_first)
+        self._fixed_clock = True
+        frame_times = []
+        start = time.perf_counter()
+        try:
+            while frames is None or len(frame_times) < frames:
+                frame_start = time.perf_counter()
+                if self.profiler is not None:
+                    self.profiler.start_frame()
+                self._frame(0, False)
+                if self.profiler is not None:
+                    self.profiler.end_frame()
+                frame_times.append(time.perf_counter() - frame_start)
+                if until is not None and until():
+                    break
+        finally:
+            self._fixed_clock = False
+        wall_time = time.perf_counter() - start
+        return {
+            'frames': len(frame_times),
+            'time': wall_time,
+            'fps': len(frame_times) / wall_time if wall_time else 0.0,
+            'frame_times': frame_times,
+        }
+
+    def measure_input_latency(self, samples: int = 20, input_first: bool = False, render_all: bool = False,
+                              key: int = K_SPACE):
+        """
+        测量输入到显示(input-to-photon)的延迟，常与无窗口模式一起使用。
+        每次在一帧显示后放入一个按键事件(模拟等待下一帧时按下按键)，按FPS运行主循环，
+        直到被update装饰的函数在FastGame.input中看到此按键，记录到那一帧显示完成的时间。
+        已经进入过主循环时，不再调用被when_start装饰的函数；结束后恢复原来的绘制和输入顺序。
+        
+        >>> game = FastGame(headless=True, fps=60)
+        >>> print(game.measure_input_latency()['mean'])
+        
+        :param samples: 测量次数。
+        :param input_first: 是否先处理事件再更新，见mainloop。
+        :param render_all: 刷新窗口是否全部绘制。
+        :param key: 模拟按下的按键。
+        :return: 统计信息，包括每次的延迟latencies(毫秒)、平均值mean、最大值max和平均帧数frames。
+        :rtype: dict
+        """
+        update = self._views.get(UPDATE, _pass)
+        seen = []
+        
+        def probe(*args):
+            update(*args)
+            if self.input.was_pressed(key):
+                seen.append(True)
+        
+        self._views[UPDATE] = probe
+        old_input_first = self.input_first
+        old_render_all = self._render_all
+        latencies = []
+        frames = []
+        try:
+            self._start(render_all, self.logic_fps, self.max_steps, input_first, start_hooks=not self._started)
+            self.tick_fps()
+            self._frame(0, False)
+            for _ in range(samples):
+                seen.clear()
+                pygame.event.post(pygame.event.Event(KEYDOWN, key=key, mod=0, unicode='', scancode=0))
+                start = time.perf_counter()
+                count = 0
+                while not seen:
+                    self.tick_fps()
+                    self._frame(0, False)
+                    count += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                frames.append(count)
+        finally:
+            if update is _pass:
+                self._views.pop(UPDATE, None)
+            else:
+                self._views[UPDATE] = update
+            self.input_first = old_input_first
+            if self._render_all != old_render_all:
+                self._render_all = old_render_all
+                self._last_draws = None  # 切换绘制模式后整体重绘
+        return {
+            'latencies': latencies,
+            'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'max': max(latencies, default=0.0),
+            'frames': sum(frames) / len(frames) if frames else 0.0,
+        }
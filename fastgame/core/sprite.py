@@ -6,16 +6,37 @@ fastgame.core.sprite
 >>> sprite = Sprite('test.jpg')
 """
 
-from typing import Union, Tuple
+import weakref
+from typing import Any, Union, Tuple
 from os.path import join, isfile
 
 import pygame
 
 import fastgame
 from fastgame.exceptions import *
+from fastgame.utils import texture
 
 __all__ = ['Sprite']
 
+_masks = weakref.WeakKeyDictionary()  # 图片 -> 遮罩，相同图片的角色共享同一遮罩
+_bounds = weakref.WeakKeyDictionary()  # 图片 -> 不透明部分的矩形
+
+
+def _get_mask(image: pygame.Surface):
+    mask = _masks.get(image)
+    if mask is None:
+        mask = _masks[image] = pygame.mask.from_surface(image)
+    return mask
+
+
+def _get_bounds(image: pygame.Surface):
+    bounds = _bounds.get(image)
+    if bounds is None:
+        rects = _get_mask(image).get_bounding_rects()
+        bounds = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        _bounds[image] = bounds
+    return bounds
+
 
 class Sprite(pygame.sprite.Sprite):
     def __init__(self, image: str, size: Union[None, Tuple[int, int]] = None):
@@ -25,6 +46,7 @@ class Sprite(pygame.sprite.Sprite):
         >>> sprite = Sprite('test.jpg')
         
         图片格式支持PNG、JPG、GIF、BMP等常见图片格式。
+        图片通过全局图片缓存加载，相同图片和大小的角色共享同一图片。
         
         角色的坐标系统以左上角为(X, Y)，而不是中间。
         
@@ -35,9 +57,8 @@ class Sprite(pygame.sprite.Sprite):
         super().__init__()  # 调用pygame.sprite.Sprite初始化
         if not isfile(image):
             image = join('resources', 'images', image)
-        self.image = pygame.image.load(image)
+        self.image = texture.load(image, size)
         if size:
-            self.image = pygame.transform.scale(self.image, size)
             self.width, self.height = size
         self.rect = self.image.get_rect()
         if not size:
@@ -45,9 +66,12 @@ class Sprite(pygame.sprite.Sprite):
         if not fastgame.games:
             raise NotCreatedGameError('did not create FastGame object')
         game = fastgame.games[-1]
+        self.game = game
         self.screen = game.window
         self._show = True
         self.click_func = None
+        self._worlds = []  # 所在的碰撞世界
+        self._scripts = []  # 正在运行的脚本
         
     def __copy__(self):
         return self.clone()
@@ -59,6 +83,22 @@ class Sprite(pygame.sprite.Sprite):
     @position.setter
     def position(self, pos: Tuple[int, int]):
         self.rect.x, self.rect.y = pos
+        self._moved()
+        
+    @property
+    def mask(self):
+        """
+        此角色图片的遮罩，第一次使用时生成，之后直接从缓存取得。
+        
+        :return: 遮罩。
+        :rtype: pygame.mask.Mask
+        """
+        return _get_mask(self.image)
+        
+    def _moved(self):
+        # 通知所在的碰撞世界更新格子
+        for world in self._worlds:
+            world.update(self)
         
     def update(self):
         """
@@ -69,59 +109,123 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         if self._show:
-            self.screen.blit(self.image, self.rect)
+            self.game.blit(self, self.image, self.rect.copy())
         
-    def collide_other(self, sprite: pygame.sprite.Sprite):
+    def collide_other(self, sprite: pygame.sprite.Sprite, precise: bool = False):
         """
         检测此角色是否碰到了另一角色。
         
-        判断方法基于两个角色的矩形碰撞！
+        默认判断方法基于两个角色的矩形碰撞！
         当有非长方形的角色参与检测，会出现看似没有碰撞，检测却是碰撞的情况！
+        设置precise为True时，矩形碰撞后再使用遮罩逐像素检测。
         
         :param sprite: 另一角色。
+        :param precise: 是否使用遮罩逐像素检测。
         :return: 是否碰撞。
         :rtype: bool
         """
-        return pygame.sprite.collide_rect(self, sprite)
+        if not pygame.sprite.collide_rect(self, sprite):
+            return False
+        if not precise:
+            return True
+        other_mask = getattr(sprite, 'mask', None)
+        if other_mask is None:
+            other_mask = _get_mask(sprite.image)
+        offset = (sprite.rect.x - self.rect.x, sprite.rect.y - self.rect.y)
+        return self.mask.overlap(other_mask, offset) is not None
     
-    def collide_mouse(self):
+    def collide_mouse(self, precise: bool = False):
         """
         检测此角色是否碰到了鼠标指针。
         
-        判断方法基于角色矩形！
+        默认判断方法基于角色矩形！
         当有非长方形的角色参与检测，会出现看似没有碰撞，检测却是碰撞的情况！
+        设置precise为True时，矩形碰撞后再使用遮罩逐像素检测。
         
+        :param precise: 是否使用遮罩逐像素检测。
         :return: 是否碰撞。
         :rtype: bool
         """
-        x, y = pygame.mouse.get_pos()
+        x, y = self.game.input.mouse_pos
+        if precise:
+            if not self.rect.collidepoint(x, y):
+                return False
+            return bool(self.mask.get_at((x - self.rect.x, y - self.rect.y)))
         a, b = self.rect.center
         w, h = self.rect.width, self.rect.height
         return (a - w / 2 < x < a + w / 2) and (b - h / 2 < b < b + h / 2)
         
-    def collide_edge(self):
+    def collide_edge(self, precise: bool = False):
         """
         检测此角色是否碰到了边缘。
 
-        判断方法基于角色矩形！
+        默认判断方法基于角色矩形！
         当有非长方形的角色参与检测，会出现看似没有碰撞，检测却是碰撞的情况！
+        设置precise为True时，使用图片不透明部分的矩形检测。
 
+        :param precise: 是否使用图片不透明部分的矩形检测。
         :return: 是否碰撞左右边缘、是否碰撞上下边缘。
         :rtype: Tuple[bool, bool]
         """
         screen_rect = self.screen.get_rect()
         width, height = screen_rect.width, screen_rect.height
-        return (self.rect.x <= 0 or self.rect.right >= width), \
-               (self.rect.y <= 0 or self.rect.bottom >= height)
+        rect = self.rect
+        if precise:
+            rect = _get_bounds(self.image).move(rect.topleft)
+        return (rect.x <= 0 or rect.right >= width), \
+               (rect.y <= 0 or rect.bottom >= height)
     
-    def move_to_mouse(self):
+    def script(self, script: Any, *args):
+        """
+        为此角色启动脚本，脚本从下一帧开始运行，见FastGame.script。
+        传入生成器函数时，使用此角色和args调用。
+        
+        >>> def patrol(sprite, step):
+        >>>     while True:
+        >>>         sprite.add_x(step)
+        >>>         yield 0.5
+        >>>         sprite.add_x(-step)
+        >>>         yield 0.5
+        >>> sprite.script(patrol, 10)
+        
+        :param script: 生成器或生成器函数。
+        :param args: 生成器函数的参数。
+        :return: 脚本，可以调用stop停止。
+        :rtype: fastgame.utils.scripts.Script
+        """
+        if callable(script):
+            script = script(self, *args)
+        return self.game.scripts.start(script, self)
+    
+    def stop_scripts(self):
+        """
+        停止此角色的所有脚本。
+        """
+        for script in list(self._scripts):
+            script.stop()
+            
+    def kill(self):
+        """
+        从所有组和碰撞世界中移除此角色，并停止此角色的所有脚本。
+        """
+        self.stop_scripts()
+        for world in list(self._worlds):
+            world.remove(self)
+        super().kill()
+        
+    def move_to_mouse(self, late_latch: bool = False):
         """
         移动至鼠标指针的位置。
         
+        :param late_latch: 是否在这一帧显示前再次移动到最新的鼠标位置，见FastGame.late_latch。
+                           适合跟随鼠标的光标、准星等角色，需要在调用update之前调用。
         :return: 无。
         :rtype: None
         """
-        self.rect.x, self.rect.y = pygame.mouse.get_pos()
+        self.rect.x, self.rect.y = self.game.input.mouse_pos
+        self._moved()
+        if late_latch:
+            self.game.late_latch(self)
         
     def add_x(self, add: int):
         """
@@ -132,6 +236,7 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         self.rect.x += add
+        self._moved()
         
     def add_y(self, add: int):
         """
@@ -142,6 +247,7 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         self.rect.y += add
+        self._moved()
         
     def set_x(self, x: int):
         """
@@ -152,6 +258,7 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         self.rect.x = x
+        self._moved()
         
     def set_y(self, y: int):
         """
@@ -162,6 +269,7 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         self.rect.y = y
+        self._moved()
         
     def move_to(self, x: int, y: int):
         """
@@ -173,18 +281,21 @@ class Sprite(pygame.sprite.Sprite):
         :rtype: None
         """
         self.rect.x, self.rect.y = x, y
+        self._moved()
         
     def clone(self):
         """
         创建克隆体。
         克隆体的位置于此角色的位置相同。
+        克隆体与此角色共享图片，直到被缩放。
         
         :return: 克隆体
         :rtype: Sprite
         """
         sprite = Sprite(**self._values)
+        sprite.image = self.image
         sprite.rect = self.rect.copy()
-        sprite.resize(self.rect.size)
+        sprite.width, sprite.height = self.width, self.height
         return sprite
     
     def hide(self):
@@ -219,6 +330,7 @@ class Sprite(pygame.sprite.Sprite):
         self.rect = self.image.get_rect()
         self.rect.x, self.rect.y = temp.x, temp.y
         del temp
+        self._moved()
         
     def set_image(self, image: str, size: Tuple[int, int] = None):
         """
@@ -229,13 +341,10 @@ class Sprite(pygame.sprite.Sprite):
         :return: 无。
         :rtype: None
         """
-        self.image = pygame.image.load(image)
+        self.image = texture.load(image, size)
         temp = self.rect.copy()
         self.rect = self.image.get_rect()
         self.rect.x, self.rect.y = temp.x, temp.y
         del temp
-        if size:
-            self.image = pygame.transform.scale(self.image, size)
-            self.width, self.height = size
-        else:
-            self.width, self.height = self.rect.size
+        self.width, self.height = self.rect.size
+        self._moved()
@@ -0,0 +1,195 @@
+"""
+fastgame.core.world
+碰撞世界文件，基于空间哈希的批量碰撞检测。
+
+>>> from fastgame import CollisionWorld
+>>> world = CollisionWorld()
+"""
+
+from collections import defaultdict
+from typing import Tuple, Iterable, List
+
+import pygame
+
+__all__ = ['CollisionWorld']
+
+
+class CollisionWorld(object):
+    def __init__(self, cell_size: int = 64):
+        """
+        Fastgame碰撞世界类。
+        将窗口划分为大小相同的格子，每个角色只记录在它的矩形覆盖的格子中，
+        检测碰撞时只需比较相同格子中的角色。
+
+        >>> from fastgame import FastGame, Sprite, CollisionWorld
+        >>> game = FastGame()
+        >>> world = CollisionWorld()
+        >>> bullets = [Sprite('bullet.png') for _ in range(1000)]
+        >>> enemies = [Sprite('enemy.png') for _ in range(100)]
+        >>> world.add(*bullets, *enemies)
+        >>> for bullet, enemy in world.collide_groups(bullets, enemies):
+        >>>     enemy.hide()
+
+        Sprite通过move_to、add_x、add_y等方法移动时，会自动更新所在的格子；
+        直接修改rect后，需要调用CollisionWorld.update。
+
+        判断方法基于角色矩形！
+
+        :param cell_size: 格子大小，一般取角色大小的一到两倍。
+        """
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)  # 格子 -> 格子中的角色
+        self._ranges = {}  # 角色 -> 覆盖的格子范围
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __contains__(self, sprite):
+        return sprite in self._ranges
+
+    def __iter__(self):
+        return iter(list(self._ranges))
+
+    def _cell_range(self, rect: pygame.Rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                max(rect.left, rect.right - 1) // size, max(rect.top, rect.bottom - 1) // size)
+
+    def _link(self, sprite, cell_range):
+        left, top, right, bottom = cell_range
+        cells = self._cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cells[x, y].add(sprite)
+        self._ranges[sprite] = cell_range
+
+    def _unlink(self, sprite, cell_range):
+        left, top, right, bottom = cell_range
+        cells = self._cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells[x, y]
+                cell.discard(sprite)
+                if not cell:
+                    del cells[x, y]
+
+    def add(self, *sprites: pygame.sprite.Sprite):
+        """
+        将角色加入碰撞世界。
+
+        :param sprites: 角色，需要有rect属性。
+        """
+        for sprite in sprites:
+            if sprite in self._ranges:
+                continue
+            self._link(sprite, self._cell_range(sprite.rect))
+            worlds = getattr(sprite, '_worlds', None)
+            if worlds is not None:
+                worlds.append(self)
+
+    def remove(self, *sprites: pygame.sprite.Sprite):
+        """
+        将角色移出碰撞世界。
+
+        :param sprites: 角色。
+        """
+        for sprite in sprites:
+            cell_range = self._ranges.pop(sprite, None)
+            if cell_range is None:
+                continue
+            self._unlink(sprite, cell_range)
+            worlds = getattr(sprite, '_worlds', None)
+            if worlds is not None and self in worlds:
+                worlds.remove(self)
+
+    def clear(self):
+        """
+        移出所有角色。
+        """
+        self.remove(*self._ranges)
+
+    def update(self, *sprites: pygame.sprite.Sprite):
+        """
+        根据角色当前的rect更新所在的格子。
+        不传入参数时，更新所有角色。
+
+        :param sprites: 角色。
+        """
+        ranges = self._ranges
+        for sprite in sprites or list(ranges):
+            old = ranges.get(sprite)
+            if old is None:
+                continue
+            new = self._cell_range(sprite.rect)
+            if new != old:
+                self._unlink(sprite, old)
+                self._link(sprite, new)
+
+    def _candidates(self, rect: pygame.Rect):
+        left, top, right, bottom = self._cell_range(rect)
+        cells = self._cells
+        if left == right and top == bottom:
+            return cells.get((left, top), ())
+        result = set()
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells.get((x, y))
+                if cell:
+                    result.update(cell)
+        return result
+
+    def sprites_in_rect(self, rect: pygame.Rect):
+        """
+        获取与矩形碰撞的所有角色。
+
+        :param rect: 矩形。
+        :return: 角色列表。
+        :rtype: list
+        """
+        rect = pygame.Rect(rect)
+        return [sprite for sprite in self._candidates(rect) if rect.colliderect(sprite.rect)]
+
+    def sprites_at_point(self, x: int, y: int):
+        """
+        获取覆盖某点的所有角色。
+
+        :param x: X坐标。
+        :param y: Y坐标。
+        :return: 角色列表。
+        :rtype: list
+        """
+        size = self.cell_size
+        cell = self._cells.get((x // size, y // size), ())
+        return [sprite for sprite in cell if sprite.rect.collidepoint(x, y)]
+
+    def collide_sprite(self, sprite: pygame.sprite.Sprite):
+        """
+        获取与某角色碰撞的所有其他角色。
+
+        :param sprite: 角色。
+        :return: 角色列表。
+        :rtype: list
+        """
+        rect = sprite.rect
+        return [other for other in self._candidates(rect)
+                if other is not sprite and rect.colliderect(other.rect)]
+
+    def collide_groups(self, group_a: Iterable[pygame.sprite.Sprite],
+                       group_b: Iterable[pygame.sprite.Sprite]) -> List[Tuple]:
+        """
+        获取两组角色之间所有碰撞的角色对。
+        第二组角色需要已加入此碰撞世界。
+
+        :param group_a: 第一组角色。
+        :param group_b: 第二组角色。
+        :return: 碰撞的角色对列表，每对为(第一组角色, 第二组角色)。
+        :rtype: List[Tuple]
+        """
+        group_b = set(group_b)
+        pairs = []
+        for sprite in group_a:
+            rect = sprite.rect
+            for other in self._candidates(rect):
+                if other in group_b and other is not sprite and rect.colliderect(other.rect):
+                    pairs.append((sprite, other))
+        return pairs
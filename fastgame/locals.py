@@ -12,6 +12,7 @@ ON_KEY_DOWN = 'on-key-down'
 ON_KEY_UP = 'on-key-up'
 
 UPDATE = 'update'
+FIXED_UPDATE = 'fixed-update'
 JUDGE = 'judge'
 
 MUSIC = 'pygame.mixer.music'
@@ -63,3 +64,9 @@ UNKNOWN = 'unknown'
 # FPS modes
 BEFORE = 'before'
 AFTER = 'after'
+
+# Waveforms
+SINE = 'sine'
+SQUARE = 'square'
+TRIANGLE = 'triangle'
+SAWTOOTH = 'sawtooth'
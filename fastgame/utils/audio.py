@@ -0,0 +1,139 @@
+"""
+fastgame.utils.audio
+Fastgame音频缓存工具。
+
+>>> from fastgame import audio
+>>> wav = audio.load('test.mp3')
+"""
+
+import os
+import threading
+
+from fastgame.exceptions import *
+from fastgame.utils.diskcache import DiskCache, file_hash
+
+try:
+    from pydub import AudioSegment
+except (ModuleNotFoundError, ImportError):
+    class _raise_error(object):
+        def from_mp3(self, mp3: str):
+            raise CannotImportError('fastgame cannot import pydub')
+
+    AudioSegment = _raise_error()
+
+__all__ = ['AudioCache', 'cache', 'load', 'clear', 'need_decode']
+
+
+def need_decode(file: str):
+    """
+    判断音频文件是否需要解码后才能被pygame加载。
+
+    :param file: 音频文件路径。
+    :return: 是否需要解码。
+    :rtype: bool
+    """
+    return file.lower().endswith('.mp3')  # pygame不支持mp3
+
+
+class AudioCache(DiskCache):
+    def __init__(self, directory: str = None, max_bytes: int = 512 * 1024 * 1024):
+        """
+        解码后音频的磁盘缓存。
+        pygame不支持的音频(MP3)解码为WAV后，按音频文件的指纹(见fastgame.utils.diskcache.file_hash)保存，
+        之后的加载(包括之后启动的程序)直接使用WAV文件，不再解码。
+        超出磁盘预算时，淘汰最久未使用的WAV文件。
+
+        :param directory: 缓存文件夹，默认为~/.fastgame/audio_cache。
+        :param max_bytes: 磁盘预算，单位为字节。
+        """
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.fastgame', 'audio_cache')
+        super().__init__(directory, max_bytes)
+        self._lock = threading.Lock()
+        self._decoding = {}  # WAV文件路径 -> 正在解码此文件的锁
+
+    def _path(self, file: str):
+        return os.path.join(self.directory, file_hash(file) + '.wav')
+
+    def get(self, file: str):
+        """
+        取得可以被pygame加载的音频文件路径。
+
+        :param file: 音频文件路径。
+        :return: 不需要解码时为原路径，已缓存时为WAV文件路径，否则为None。
+        :rtype: str
+        """
+        if not need_decode(file):
+            return file
+        path = self._path(file)
+        if not os.path.isfile(path):
+            return None
+        os.utime(path)  # 记录使用时间，用于LRU淘汰
+        return path
+
+    def load(self, file: str):
+        """
+        取得可以被pygame加载的音频文件路径，未缓存时先解码并写入缓存。
+
+        :param file: 音频文件路径。
+        :return: 音频文件路径。
+        :rtype: str
+        """
+        path = self.get(file)
+        if path is not None:
+            return path
+        path = self._path(file)
+        with self._lock:
+            lock = self._decoding.setdefault(path, threading.Lock())
+        try:
+            with lock:  # 多个线程同时加载同一文件时只解码一次
+                if os.path.isfile(path):
+                    return path
+                os.makedirs(self.directory, exist_ok=True)
+                temp = f'{path}.{os.getpid()}.tmp'
+                AudioSegment.from_mp3(file).export(temp, format='wav')
+                os.replace(temp, path)
+        finally:
+            with self._lock:
+                self._decoding.pop(path, None)
+        self.evict(keep=path)
+        return path
+
+    def _entry(self, name: str):
+        # 键为WAV文件路径
+        if not name.endswith('.wav'):
+            return None
+        path = os.path.join(self.directory, name)
+        return path, os.path.getsize(path), os.path.getmtime(path)
+
+    def remove(self, key: str):
+        """
+        删除一个缓存的WAV文件。
+
+        :param key: WAV文件路径。
+        """
+        try:
+            os.remove(key)
+        except OSError:  # 不存在或正在被使用
+            pass
+
+
+cache = AudioCache()  # 全局音频缓存
+
+
+def load(file: str):
+    """
+    从全局音频缓存中取得可以被pygame加载的音频文件路径。
+
+    :param file: 音频文件路径。
+    :return: 音频文件路径。
+    :rtype: str
+    """
+    return cache.load(file)
+
+
+def clear():
+    """
+    清空全局音频缓存。
+    """
+    cache.clear()
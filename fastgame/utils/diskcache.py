@@ -0,0 +1,103 @@
+"""
+fastgame.utils.diskcache
+Fastgame磁盘缓存基类，音频缓存和视频帧缓存共用。
+底层模块
+"""
+
+import hashlib
+import os
+from abc import ABC, abstractmethod
+
+__all__ = ['DiskCache', 'file_hash']
+
+_hashes = {}  # (路径, 文件大小, 修改时间) -> 指纹
+_SAMPLE = 1024 * 1024  # 指纹读取文件开头和结尾的字节数
+
+
+def file_hash(file: str):
+    """
+    文件的指纹：文件大小和开头、结尾内容的哈希，不需要读取整个文件。
+    同一进程中未修改的文件只计算一次。
+
+    :param file: 文件路径。
+    :return: 十六进制的指纹。
+    :rtype: str
+    """
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime)
+    digest = _hashes.get(key)
+    if digest is None:
+        hasher = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+        with open(file, 'rb') as f:
+            hasher.update(f.read(_SAMPLE))
+            if stat.st_size > 2 * _SAMPLE:
+                f.seek(-_SAMPLE, os.SEEK_END)
+            hasher.update(f.read())
+        digest = _hashes[key] = hasher.hexdigest()
+    return digest
+
+
+class DiskCache(ABC):
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        按最近使用时间淘汰的磁盘缓存文件夹。
+        子类实现_entry和remove，分别说明文件夹中的一个文件是否为缓存条目和如何删除条目。
+
+        :param directory: 缓存文件夹。
+        :param max_bytes: 磁盘预算，单位为字节。
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @abstractmethod
+    def _entry(self, name: str):
+        # 文件夹中名为name的文件对应的(键, 字节数, 最近使用时间)，不是缓存条目时为None
+        pass
+
+    def entries(self):
+        """
+        取得所有缓存条目。
+
+        :return: (键, 字节数, 最近使用时间)的列表，最久未使用的在前。
+        :rtype: list
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in os.listdir(self.directory):
+            entry = self._entry(name)
+            if entry is not None:
+                result.append(entry)
+        result.sort(key=lambda entry: entry[2])
+        return result
+
+    def evict(self, keep: str = None):
+        """
+        淘汰最久未使用的条目，直到不超过磁盘预算。
+
+        :param keep: 不淘汰的键。
+        """
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+
+    @abstractmethod
+    def remove(self, key: str):
+        """
+        删除一个缓存条目。
+
+        :param key: 键。
+        """
+
+    def clear(self):
+        """
+        清空缓存。
+        """
+        for key, _, _ in self.entries():
+            self.remove(key)
@@ -15,27 +15,44 @@ __all__ = ['Event']
 
 
 class Event(object):
+    __slots__ = ('_event', '_dict')
+    
     def __init__(self, event: pygame.event.Event = None):
         """
         Fastgame事件类。
+        只保存pygame事件，读取时才从中取得属性。
         
         :param event: pygame事件。
         """
-        if event is None:
-            return
         self._event = event
-        self._dict = {'type': event.type}
-        for attr in ('key', 'pos', 'button', 'unicode', 'mod', 'joy', 'buttons', 'rel',
-                     'axis', 'value', 'gain', 'state', 'size', 'w', 'h'):
-            try:
-                self._dict[attr] = getattr(event, attr)
-            except AttributeError:
-                pass
+        self._dict = None  # 通过[]设置的属性
+        
+    def __bool__(self):
+        return self._event is not None
+        
+    def get(self, value, default=None):
+        """
+        取得事件详细信息。
+        
+        :param value: 事件属性名。
+        :param default: 属性不存在时的默认值。
+        :return: 事件信息。
+        """
+        if self._dict is not None and value in self._dict:
+            return self._dict[value]
+        event = self._event
+        if event is None:
+            return default
+        if value == 'type':
+            return event.type
+        return event.dict.get(value, default)
         
     def __getitem__(self, item):
-        return self._dict.get(item)
+        return self.get(item)
     
     def __setitem__(self, key, value):
+        if self._dict is None:
+            self._dict = {}
         self._dict[key] = value
 
     def has_key(self, name: str):
@@ -46,14 +63,9 @@ class Event(object):
         :return: 是否存在此属性。
         :rtype: bool
         """
-        return name in self._dict
-    
-    def get(self, value, default=None):
-        """
-        取得事件详细信息。
-        
-        :param value: 事件属性名。
-        :param default: 属性不存在时的默认值。
-        :return: 事件信息。
-        """
-        return self._dict.get(value, default)
+        if self._dict is not None and name in self._dict:
+            return True
+        event = self._event
+        if event is None:
+            return False
+        return name == 'type' or name in event.dict
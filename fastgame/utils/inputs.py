@@ -0,0 +1,124 @@
+"""
+fastgame.utils.inputs
+Fastgame输入状态工具。
+
+>>> import fastgame
+>>> game = fastgame.FastGame()
+>>> type(game.input)
+
+fastgame.utils.inputs.InputState
+"""
+
+from typing import Iterable
+
+import pygame
+from pygame.locals import *
+
+from fastgame.locals import LEFT_BUTTON
+
+__all__ = ['InputState']
+
+
+class InputState(object):
+    __slots__ = ('events', 'keys', 'pressed', 'released', 'mouse_pos', 'mouse_buttons',
+                 'mouse_downs', 'mouse_ups', 'wheel', 'frame')
+
+    def __init__(self, events: Iterable[pygame.event.Event] = (), frame: int = 0):
+        """
+        一帧的输入状态快照，创建后不能修改。
+        FastGame每帧取得事件后创建一次，之后读取不再查询SDL，也不会漏掉同一帧中的多个事件。
+
+        events: 这一帧的所有pygame事件。
+        keys: 每个按键是否按住，即pygame.key.get_pressed()。
+        pressed、released: 这一帧按下、松开的按键。
+        mouse_pos: 鼠标位置。
+        mouse_buttons: 每个鼠标按键是否按住。
+        mouse_downs、mouse_ups: 这一帧按下、松开鼠标的(按键, 位置)。
+        wheel: 这一帧鼠标滚轮滚动的(x, y)。
+        frame: 创建时的帧数。
+
+        :param events: 这一帧的所有pygame事件。
+        :param frame: 帧数。
+        """
+        events = tuple(events)
+        pressed = set()
+        released = set()
+        mouse_downs = []
+        mouse_ups = []
+        wheel_x = wheel_y = 0
+        for event in events:
+            if event.type == KEYDOWN:
+                pressed.add(event.key)
+            elif event.type == KEYUP:
+                released.add(event.key)
+            elif event.type == MOUSEBUTTONDOWN:
+                mouse_downs.append((event.button, event.pos))
+            elif event.type == MOUSEBUTTONUP:
+                mouse_ups.append((event.button, event.pos))
+            elif event.type == MOUSEWHEEL:
+                wheel_x += event.x
+                wheel_y += event.y
+        setattr_ = super().__setattr__
+        setattr_('events', events)
+        setattr_('keys', pygame.key.get_pressed())
+        setattr_('pressed', frozenset(pressed))
+        setattr_('released', frozenset(released))
+        setattr_('mouse_pos', pygame.mouse.get_pos())
+        setattr_('mouse_buttons', pygame.mouse.get_pressed())
+        setattr_('mouse_downs', tuple(mouse_downs))
+        setattr_('mouse_ups', tuple(mouse_ups))
+        setattr_('wheel', (wheel_x, wheel_y))
+        setattr_('frame', frame)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('InputState is read-only')
+
+    def is_down(self, key: int):
+        """
+        检测某按键是否按住。
+
+        :param key: 按键。
+        :return: 是否按住。
+        :rtype: bool
+        """
+        return bool(self.keys[key])
+
+    def was_pressed(self, key: int):
+        """
+        检测这一帧是否按下了某按键。
+
+        :param key: 按键。
+        :return: 是否按下。
+        :rtype: bool
+        """
+        return key in self.pressed
+
+    def was_released(self, key: int):
+        """
+        检测这一帧是否松开了某按键。
+
+        :param key: 按键。
+        :return: 是否松开。
+        :rtype: bool
+        """
+        return key in self.released
+
+    def clicked(self, button: int = LEFT_BUTTON):
+        """
+        取得这一帧按下某鼠标按键的所有位置。
+
+        :param button: 鼠标按键。
+        :return: 位置列表，没有按下时为空。
+        :rtype: list
+        """
+        return [pos for down, pos in self.mouse_downs if down == button]
+
+    def of_type(self, event_type: int):
+        """
+        取得这一帧某种类型的所有事件。
+
+        :param event_type: pygame事件类型。
+        :return: 事件列表。
+        :rtype: list
+        """
+        return [event for event in self.events if event.type == event_type]
@@ -10,41 +10,158 @@ Fastgame音频播放工具。
 from fastgame.locals import *
 from fastgame.exceptions import *  # 必须先导入
 
+import os
+import threading
+import time
+import wave
+from typing import Callable, Iterable
+
 import pygame
 from pygame.mixer import music
 
-try:
-    from pydub import AudioSegment
-except (ModuleNotFoundError, ImportError):
-    class _raise_error(object):
-        def from_mp3(self, mp3: str):
-            raise CannotImportError('fastgame cannot import pydub')
-    
-    AudioSegment = _raise_error()
-
+from fastgame.utils import audio
 
-def _mp3_to_wav(mp3: str, wav: str):
-    song = AudioSegment.from_mp3(mp3)
-    song.export(wav, format='wav')
-    return song
+_music_file = None  # 已加载到music中的文件
+MUSIC_END = pygame.event.custom_type()  # 播放列表使用music时，曲目结束发送的事件
 
 
 class Player(object):
-    def __init__(self, file: str, temp_wav: str = 'temp.wav'):
+    def __init__(self, file: str, temp_wav: str = None, wait: bool = True, engine: str = MUSIC):
         """
         音频播放器类。
         支持MP3(必须要有FFMpeg环境)、OGG、WAV(未压缩)
+        MP3文件解码后保存在音频缓存中(见fastgame.utils.audio)，同一文件只解码一次。
+        
+        只加载当前引擎需要的数据：mixer引擎将整个音频解码到内存中的Sound，
+        music引擎播放时才用music.load流式读取文件。切换引擎后第一次使用时才加载。
+        每个播放器的加载耗时和内存占用见Player.stats。
+        
+        wait为False时在后台线程中加载，不阻塞游戏循环，见Player.load。
         
         :param file: 音频文件
-        :param temp_wav: 若为mp3音频文件，则为临时WAV文件路径。
+        :param temp_wav: 已弃用，保留以兼容旧代码。
+        :param wait: 是否等待加载完成。
+        :param engine: 播放引擎，MUSIC或MIXER。
         """
-        if file.lower().endswith('.mp3'):  # pygame不支持mp3
-            file = _mp3_to_wav(file, temp_wav)
-        self.sound = pygame.mixer.Sound(file)
-        self.music = music.load(file)
-        self._engine = MUSIC  # music音质好
+        self.file = file
+        self.path = None  # 可以被pygame加载的文件
+        self.error = None
+        self._sound = None
+        self._loaded = threading.Event()
+        self._engine = engine  # music音质好
+        self._stats = {'decode_time': 0.0, 'sound_time': 0.0, 'music_time': 0.0}
         
         self.start = self.play  # API
+        if wait:
+            self._load()
+        else:
+            self.load()
+    
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            self.path = audio.load(self.file)
+            self._stats['decode_time'] = time.perf_counter() - start
+            if self._engine == MIXER:
+                self._load_sound()
+        except Exception as error:  # 在wait中重新抛出
+            self.error = error
+            raise
+        finally:
+            self._loaded.set()
+    
+    def load(self, callback: Callable[['Player'], None] = None):
+        """
+        在后台线程中重新加载音频。
+        加载完成前调用play等方法会等待加载完成。
+        
+        :param callback: 加载完成后调用，参数为此播放器，会在后台线程中调用。
+        :return: 后台线程。
+        :rtype: threading.Thread
+        """
+        self._loaded.clear()
+        self.error = None
+        self._sound = None
+        
+        def target():
+            try:
+                self._load()
+            except Exception:
+                pass
+            if callback is not None:
+                callback(self)
+        
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+    
+    @property
+    def ready(self):
+        """
+        是否已加载完成(包括加载失败)。
+        
+        :rtype: bool
+        """
+        return self._loaded.is_set()
+    
+    def wait(self, timeout: float = None):
+        """
+        等待加载完成。
+        
+        :param timeout: 最多等待的秒数，默认一直等待。
+        :return: 是否已加载完成。
+        :rtype: bool
+        """
+        if not self._loaded.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+    
+    def _load_sound(self):
+        start = time.perf_counter()
+        self._sound = pygame.mixer.Sound(self.path)
+        self._stats['sound_time'] = time.perf_counter() - start
+        
+    @property
+    def sound(self):
+        """
+        mixer引擎使用的Sound，第一次使用时才加载。
+        
+        :rtype: pygame.mixer.Sound
+        """
+        if self._sound is None:
+            self.wait()
+            if self._sound is None:
+                self._load_sound()
+        return self._sound
+    
+    def _load_music(self):
+        # 播放时才将文件加载到music中，不打断其他播放器正在播放的音乐
+        global _music_file
+        self.wait()
+        if _music_file != self.path:
+            start = time.perf_counter()
+            music.load(self.path)
+            self._stats['music_time'] = time.perf_counter() - start
+            _music_file = self.path
+    
+    @property
+    def stats(self):
+        """
+        此播放器的加载耗时和内存占用。
+        
+        :return: decode_time(解码MP3)、sound_time(加载Sound)、music_time(music.load)，单位为秒；
+                 sound_bytes为Sound占用的内存，单位为字节，未加载时为0。
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        stats['sound_bytes'] = 0
+        init = pygame.mixer.get_init()
+        if self._sound is not None and init:
+            frequency, size, channels = init
+            stats['sound_bytes'] = int(self._sound.get_length() * frequency) * channels * (abs(size) // 8)
+        return stats
     
     @staticmethod
     def set_mixer_value(frequency: int = 44100, size: int = -16, channels: int = STEREO,
@@ -85,9 +202,11 @@ class Player(object):
         :param max_time: 引擎为mixer时，在给定的毫秒数后停止播放。
         """
         if self._engine == MUSIC:
+            self._load_music()
+            Playlist.active = None  # music被此播放器使用，停止播放列表
             music.play(loops=loops, start=start, fade_ms=fade_ms)
         elif self._engine == MIXER:
-            self.sound.play(loops=loops, maxtime=max_time, fade_ms=fade_ms)
+            self.sound.play(loops=loops, maxtime=int(max_time), fade_ms=fade_ms)
         else:
             self._engine_error()
     
@@ -158,13 +277,409 @@ class Player(object):
             self._engine_error()
 
 
+def _duration(file: str):
+    # WAV文件的时长，其他格式无法不解码取得时长，为None
+    try:
+        with wave.open(file, 'rb') as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+class Playlist(object):
+    active = None  # 正在播放的播放列表
+    
+    def __init__(self, files: Iterable[str], loop: bool = True, crossfade: int = 0):
+        """
+        播放列表类，使用music引擎流式播放。
+        
+        >>> from fastgame import FastGame, Playlist
+        >>> game = FastGame()
+        >>> playlist = Playlist(['menu.ogg', 'level1.mp3', 'level2.mp3'])
+        >>> playlist.play()
+        >>> game.mainloop()
+        
+        当前曲目开始播放后，后台线程预先加载下一首(MP3解码到音频缓存中，见fastgame.utils.audio)，
+        加载完成后用music.queue排队，当前曲目结束时无缝播放下一首。
+        切换曲目不会阻塞游戏循环：曲目还没有加载完成时，继续播放当前曲目，加载完成后再切换。
+        
+        crossfade不为0时，当前曲目在结束前淡出，下一首淡入。
+        music只有一个音乐流，所以淡出和淡入先后进行，不会重叠；
+        自动切换时需要知道曲目的时长，只支持WAV和MP3，其他格式仍然无缝切换。
+        
+        FastGame的主循环每帧调用正在播放的播放列表的update，并处理MUSIC_END事件。
+        
+        :param files: 音频文件路径。
+        :param loop: 播放完最后一首后，是否从第一首重新开始。
+        :param crossfade: 淡出和淡入的时长，单位为毫秒。
+        """
+        self.files = list(files)
+        self.loop = loop
+        self.crossfade = crossfade
+        self.index = None  # 正在播放的曲目
+        self._paths = {}  # 曲目 -> 可以被pygame加载的文件，无法加载时为None
+        self._durations = {}  # 曲目 -> 时长
+        self._lock = threading.Lock()
+        self._loading = set()
+        self._want = None  # 加载完成后开始播放的(曲目, 淡入时长)
+        self._queued = None  # 已用music.queue排队的曲目
+        self._after_fade = None  # 淡出结束后开始播放的(曲目, 淡入时长)
+        self._offset = 0  # 当前曲目开始时music.get_pos的值
+        
+    def __len__(self):
+        return len(self.files)
+    
+    @property
+    def current(self):
+        """
+        正在播放的音频文件，没有时为None。
+        
+        :rtype: str
+        """
+        return None if self.index is None else self.files[self.index]
+    
+    def _next_index(self, index: int):
+        index += 1
+        if index >= len(self.files):
+            return 0 if self.loop else None
+        return index
+    
+    def _prefetch(self, index: int):
+        # 在后台线程中加载曲目
+        with self._lock:
+            if index in self._paths or index in self._loading:
+                return
+            self._loading.add(index)
+        
+        def target():
+            try:
+                path = audio.load(self.files[index])
+            except Exception:  # 无法加载的曲目会被跳过
+                path = None
+            if path is not None and not os.path.isfile(path):  # 不需要解码的文件原样返回，需要检查
+                path = None
+            duration = None if path is None else _duration(path)
+            with self._lock:
+                self._durations[index] = duration
+                self._paths[index] = path
+                self._loading.discard(index)
+        
+        threading.Thread(target=target, daemon=True).start()
+        
+    def _request(self, index: int, fade_ms: int):
+        # 曲目加载完成后开始播放
+        self._want = (index, fade_ms)
+        self._prefetch(index)
+        self.update()
+    
+    def _start(self, index: int, fade_ms: int):
+        global _music_file
+        path = self._paths[index]
+        if path is not None:
+            try:
+                music.load(path)  # 同时清除排队的曲目
+            except pygame.error:  # 文件损坏或格式不支持
+                path = self._paths[index] = None
+        if path is None:
+            if all(self._paths.get(i, 0) is None for i in range(len(self.files))):
+                self.stop()  # 所有曲目都无法加载
+                return
+            next_index = self._next_index(index)
+            if next_index is None:
+                self.stop()
+            else:
+                self._request(next_index, fade_ms)
+            return
+        music.play(fade_ms=fade_ms)
+        _music_file = path
+        self.index = index
+        self._queued = None
+        self._after_fade = None
+        self._offset = 0
+    
+    def play(self, index: int = 0):
+        """
+        开始播放某一首曲目。
+        正在播放时，crossfade不为0则先淡出当前曲目。
+        
+        :param index: 曲目索引。
+        """
+        Playlist.active = self
+        music.set_endevent(MUSIC_END)
+        self._want = None
+        self._queued = None
+        if self.crossfade and self.index is not None and music.get_busy():
+            self._after_fade = (index, self.crossfade)
+            self._prefetch(index)
+            music.fadeout(self.crossfade)
+        else:
+            self._after_fade = None
+            self._request(index, 0)
+    
+    def next(self):
+        """
+        播放下一首曲目。
+        """
+        index = self._next_index(-1 if self.index is None else self.index)
+        if index is not None:
+            self.play(index)
+            
+    def previous(self):
+        """
+        播放上一首曲目。
+        """
+        self.play(((self.index or 0) - 1) % len(self.files))
+    
+    def stop(self):
+        """
+        停止播放。
+        """
+        if Playlist.active is self:
+            Playlist.active = None
+            music.stop()
+        self.index = None
+        self._want = None
+        self._queued = None
+        self._after_fade = None
+        
+    @staticmethod
+    def pause():
+        music.pause()
+        
+    @staticmethod
+    def unpause():
+        music.unpause()
+    
+    def update(self):
+        """
+        开始播放已加载完成的曲目，预先加载下一首并排队，到时间时淡出当前曲目。
+        FastGame的主循环每帧自动调用。
+        """
+        global _music_file
+        if self._want is not None:
+            index, fade_ms = self._want
+            if index in self._paths:
+                self._want = None
+                self._start(index, fade_ms)
+            return
+        if self.index is None or self._after_fade is not None:
+            return
+        next_index = self._next_index(self.index)
+        if next_index is None:
+            return
+        self._prefetch(next_index)
+        path = self._paths.get(next_index)
+        if path is None:  # 还没有加载完成，或无法加载
+            return
+        duration = self._durations.get(self.index)
+        if self.crossfade and duration is not None:
+            remaining = duration * 1000 - (music.get_pos() - self._offset)
+            if remaining <= self.crossfade:
+                self._after_fade = (next_index, self.crossfade)
+                music.fadeout(max(int(remaining), 1))
+        elif self._queued is None:
+            try:
+                music.queue(path)
+            except pygame.error:  # 文件损坏或格式不支持，播放结束后在_start中跳过
+                self._paths[next_index] = None
+                return
+            _music_file = None  # 排队后music中的曲目不确定，播放器需要重新加载
+            self._queued = next_index
+            
+    def on_end(self):
+        """
+        处理MUSIC_END事件。
+        FastGame的主循环自动调用。
+        """
+        global _music_file
+        if self._after_fade is not None:  # 淡出结束
+            index, fade_ms = self._after_fade
+            self._after_fade = None
+            self._request(index, fade_ms)
+        elif self._queued is not None:  # 已经无缝切换到排队的曲目
+            _music_file = self._paths.get(self._queued)
+            self.index = self._queued
+            self._queued = None
+            self._offset = music.get_pos()
+        elif self.index is not None:  # 下一首没有及时加载完成
+            next_index = self._next_index(self.index)
+            self.index = None
+            if next_index is not None:
+                self._request(next_index, 0)
+
+
+class _SoundEntry(object):
+    # 音效库中的一个音效
+    __slots__ = ('sound', 'voices', 'limit', 'priority')
+    
+    def __init__(self, sound: pygame.mixer.Sound, limit: int, priority: int):
+        self.sound = sound
+        self.voices = []  # 正在播放此音效的声道编号，最早的在前
+        self.limit = limit
+        self.priority = priority
+
+
+class SoundBank(object):
+    _reserved = 0  # 所有音效库已预留的声道数
+    
+    def __init__(self, channels: int = 16):
+        """
+        音效库类。
+        按名称预先加载Sound，在预留的声道上播放，播放时只需查找字典并调用Channel.play。
+        
+        每个音效有同时发声数的上限，达到上限时重新使用最早的声道；
+        所有声道都在使用时，抢占优先级不高于新音效的最早的声道，否则不播放。
+        
+        >>> from fastgame import FastGame, SoundBank
+        >>> game = FastGame()
+        >>> bank = SoundBank()
+        >>> bank.load('shoot', 'shoot.wav', voices=3)
+        >>> bank.load('explode', 'explode.ogg', priority=1)
+        >>> bank.play('shoot')
+        
+        :param channels: 预留的声道数。
+        """
+        self.size = channels
+        self._sounds = {}  # 名称 -> _SoundEntry
+        self._channels = []
+        self._priorities = []
+        self._serials = []  # 每个声道开始播放的顺序
+        self._serial = 0
+    
+    def __contains__(self, name: str):
+        return name in self._sounds
+    
+    def __getitem__(self, name: str):
+        return self._sounds[name].sound
+    
+    def __len__(self):
+        return len(self._sounds)
+    
+    def _reserve(self):
+        # 第一次播放时预留声道，预留的声道不会被Sound.play使用
+        first = SoundBank._reserved
+        SoundBank._reserved += self.size
+        pygame.mixer.set_num_channels(pygame.mixer.get_num_channels() + self.size)
+        pygame.mixer.set_reserved(SoundBank._reserved)
+        self._channels = [pygame.mixer.Channel(first + i) for i in range(self.size)]
+        self._priorities = [0] * self.size
+        self._serials = [0] * self.size
+        return self._channels
+    
+    def load(self, name: str, file: str = None, voices: int = 4, priority: int = 0, volume: float = 1.0):
+        """
+        加载音效。
+        MP3文件解码后保存在音频缓存中(见fastgame.utils.audio)。
+        
+        :param name: 音效名称。
+        :param file: 音频文件路径，默认与名称相同。
+        :param voices: 同时发声数的上限。
+        :param priority: 优先级，所有声道都在使用时，可以抢占优先级不高于此值的声道。
+        :param volume: 音量。
+        :return: 加载的Sound。
+        :rtype: pygame.mixer.Sound
+        """
+        sound = pygame.mixer.Sound(audio.load(file or name))
+        sound.set_volume(volume)
+        self._sounds[name] = _SoundEntry(sound, max(voices, 1), priority)
+        return sound
+    
+    def unload(self, name: str):
+        """
+        停止并移除音效。
+        
+        :param name: 音效名称。
+        """
+        entry = self._sounds.pop(name, None)
+        if entry is not None:
+            entry.sound.stop()
+    
+    def _free_channel(self, priority: int):
+        # 空闲的声道，没有时为可以抢占的声道
+        best = None
+        for index, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return index
+            if self._priorities[index] <= priority and (
+                    best is None or (self._priorities[index], self._serials[index]) <
+                    (self._priorities[best], self._serials[best])):
+                best = index
+        return best
+    
+    def play(self, name: str, loops: int = 0, max_time: int = 0, fade_ms: int = 0, priority: int = None):
+        """
+        播放音效。
+        未加载的音效会先以名称为文件路径加载。
+        
+        :param name: 音效名称。
+        :param loops: 第一次播放后将重复多少次，设为-1可无限循环。
+        :param max_time: 在给定的毫秒数后停止播放。
+        :param fade_ms: 使声音以0%音量开始播放，并在给定的时间内淡入100%音量。
+        :param priority: 此次播放的优先级，默认为加载时的优先级。
+        :return: 播放音效的声道，没有可用的声道时为None。
+        :rtype: pygame.mixer.Channel
+        """
+        entry = self._sounds.get(name)
+        if entry is None:
+            self.load(name)
+            entry = self._sounds[name]
+        if priority is None:
+            priority = entry.priority
+        channels = self._channels or self._reserve()
+        
+        sound = entry.sound
+        voices = entry.voices = [index for index in entry.voices if channels[index].get_sound() is sound]
+        if len(voices) >= entry.limit:
+            index = voices.pop(0)
+        else:
+            index = self._free_channel(priority)
+            if index is None:
+                return None
+            if index in voices:
+                voices.remove(index)
+        voices.append(index)
+        
+        self._serial += 1
+        self._priorities[index] = priority
+        self._serials[index] = self._serial
+        channel = channels[index]
+        channel.play(sound, loops, int(max_time), fade_ms)
+        return channel
+    
+    def stop(self, name: str = None):
+        """
+        停止播放。
+        
+        :param name: 音效名称，不指定时停止所有音效。
+        """
+        if name is None:
+            for channel in self._channels:
+                channel.stop()
+        else:
+            self._sounds[name].sound.stop()
+
+
+sounds = SoundBank()  # play_sound使用的全局音效库
+
+
 def play_sound(file: str, **kwargs):
     """
-    播放音频。
+    播放音效。
+    音效第一次播放时加载到全局音效库sounds中，之后直接在预留的声道上播放。
+    指定start时，使用music引擎从此位置开始播放。
     
     :param file: 音频文件路径。
     :keyword loops: 第一次播放后将重复多少次，设为-1可无限循环。
     :keyword start: 音乐开始播放的时间位置。
     :keyword fade_ms: 使声音以0%音量开始播放，并在给定的时间内淡入100%音量。
+    :keyword max_time: 在给定的毫秒数后停止播放。
+    :keyword priority: 优先级，见SoundBank.play。
+    :return: 播放音效的声道，没有可用的声道或使用music引擎时为None。
+    :rtype: pygame.mixer.Channel
     """
-    Player(file).play(**kwargs)
+    if kwargs.get('start'):
+        kwargs.pop('priority', None)
+        Player(file).play(**kwargs)
+        return None
+    kwargs.pop('start', None)
+    return sounds.play(file, **kwargs)
@@ -0,0 +1,143 @@
+"""
+fastgame.utils.profiler
+Fastgame帧耗时分析工具。
+
+>>> from fastgame import FastGame
+>>> game = FastGame()
+>>> profiler = game.enable_profiler(overlay=True)
+"""
+
+import json
+import time
+from typing import Dict
+
+import numpy as np
+
+from fastgame.widget.label import Label
+
+__all__ = ['Profiler']
+
+
+class Profiler(object):
+    def __init__(self, size: int = 600, overlay: bool = False, dump_file: str = None,
+                 refresh: int = 30):
+        """
+        帧耗时分析器。
+        主循环每个阶段的耗时(perf_counter_ns)保存在固定大小的环形缓冲区中。
+
+        阶段包括: frame(整帧)、tick(等待FPS)、fill、update、events(取得事件)、
+        event:<事件名>(处理每种事件)、display(更新窗口)。
+
+        :param size: 每个阶段保存的最近记录数。
+        :param overlay: 是否在窗口左上角显示帧耗时。
+        :param dump_file: 关闭窗口时保存统计信息的JSON文件路径。
+        :param refresh: 显示帧耗时时，每隔多少帧刷新文字。
+        """
+        self.size = size
+        self.overlay = overlay
+        self.dump_file = dump_file
+        self.refresh = refresh
+        self._buffers = {}  # 阶段 -> [环形缓冲区, 写入次数]
+        self._frame_start = 0
+        self._last = 0
+        self._label = None
+        self._frames = 0
+
+    def record(self, phase: str, duration: int):
+        """
+        记录某阶段的一次耗时。
+
+        :param phase: 阶段名。
+        :param duration: 耗时，单位为纳秒。
+        """
+        entry = self._buffers.get(phase)
+        if entry is None:
+            entry = self._buffers[phase] = [np.zeros(self.size, dtype=np.int64), 0]
+        entry[0][entry[1] % self.size] = duration
+        entry[1] += 1
+
+    def start_frame(self):
+        """
+        标记一帧的开始。
+        """
+        self._frame_start = self._last = time.perf_counter_ns()
+
+    def mark(self, phase: str):
+        """
+        记录从上一次标记到现在的耗时。
+
+        :param phase: 阶段名。
+        """
+        now = time.perf_counter_ns()
+        self.record(phase, now - self._last)
+        self._last = now
+
+    def end_frame(self):
+        """
+        标记一帧的结束，记录整帧耗时。
+        """
+        self.record('frame', time.perf_counter_ns() - self._frame_start)
+        self._frames += 1
+
+    @property
+    def phases(self):
+        return list(self._buffers)
+
+    def samples(self, phase: str):
+        """
+        取得某阶段最近的耗时记录。
+
+        :param phase: 阶段名。
+        :return: 耗时记录，单位为纳秒。
+        :rtype: numpy.ndarray
+        """
+        entry = self._buffers.get(phase)
+        if entry is None:
+            return np.zeros(0, dtype=np.int64)
+        return entry[0][:min(entry[1], self.size)]
+
+    def percentiles(self, phase: str = 'frame'):
+        """
+        取得某阶段耗时的统计信息。
+
+        :param phase: 阶段名。
+        :return: 记录数count，以及p50、p95、p99、mean、max，单位为毫秒。
+        :rtype: Dict[str, float]
+        """
+        samples = self.samples(phase)
+        if not len(samples):
+            return {'count': 0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0}
+        p50, p95, p99 = (np.percentile(samples, (50, 95, 99)) / 1e6).tolist()
+        return {'count': int(len(samples)), 'p50': p50, 'p95': p95, 'p99': p99,
+                'mean': float(samples.mean() / 1e6), 'max': float(samples.max() / 1e6)}
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        取得所有阶段耗时的统计信息。
+
+        :return: 阶段名 -> 统计信息。
+        :rtype: Dict[str, Dict[str, float]]
+        """
+        return {phase: self.percentiles(phase) for phase in self._buffers}
+
+    def dump(self, file: str = None):
+        """
+        将所有阶段耗时的统计信息保存为JSON文件。
+
+        :param file: JSON文件路径，默认为dump_file。
+        """
+        with open(file or self.dump_file, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def draw(self):
+        """
+        在窗口左上角显示帧耗时。
+        文字每隔refresh帧才重新渲染。
+        """
+        if self._label is None:
+            self._label = Label('', bgcolor=(255, 255, 255))
+        if self._frames % self.refresh == 0:
+            stats = self.percentiles()
+            self._label.set_text(f'frame p50 {stats["p50"]:.2f}ms  p95 {stats["p95"]:.2f}ms  '
+                                 f'p99 {stats["p99"]:.2f}ms')
+        self._label.update()
@@ -0,0 +1,271 @@
+"""
+fastgame.utils.scripts
+Fastgame脚本模块，用生成器编写"移动、等待0.5秒、转向、重复"这样的逻辑，不会阻塞主循环。
+
+>>> from fastgame import scripts
+>>> def patrol(sprite):
+>>>     while True:
+>>>         sprite.add_x(10)
+>>>         yield 0.5  # 等待0.5秒
+>>>         sprite.add_x(-10)
+>>>         yield scripts.frames(30)  # 等待30帧
+>>> sprite.script(patrol)
+"""
+
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Union
+
+from fastgame.utils.event import Event
+from fastgame.exceptions import *
+
+__all__ = ['Script', 'ScriptRunner', 'seconds', 'frames', 'event']
+
+
+class _Frames(object):
+    __slots__ = ('count',)
+
+    def __init__(self, count: int):
+        self.count = count
+
+
+class _EventWait(object):
+    __slots__ = ('type',)
+
+    def __init__(self, event_type: int):
+        self.type = event_type
+
+
+def seconds(duration: Union[int, float]):
+    """
+    等待一段时间，yield seconds(0.5)与yield 0.5相同。
+
+    :param duration: 时长，单位为秒。
+    :return: 等待条件。
+    :rtype: float
+    """
+    return float(duration)
+
+
+def frames(count: int):
+    """
+    等待若干帧，yield frames(1)与yield None相同。
+
+    :param count: 帧数。
+    :return: 等待条件。
+    """
+    return _Frames(max(int(count), 1))
+
+
+def event(event_type: int):
+    """
+    等待某种pygame事件，yield的结果为此事件。
+
+    >>> e = yield scripts.event(KEYDOWN)
+    >>> print(e['key'])
+
+    :param event_type: pygame事件类型。
+    :return: 等待条件。
+    """
+    return _EventWait(event_type)
+
+
+class Script(object):
+    __slots__ = ('generator', 'owner', 'done', 'cancelled', '_runner', '_value', '_joiners')
+
+    def __init__(self, generator, owner: Any = None, runner: 'ScriptRunner' = None):
+        """
+        正在运行的脚本，由ScriptRunner.start返回。
+        脚本yield的等待条件：
+        None(下一帧)、秒数、frames(n)、event(事件类型)或另一个Script(等待其结束)。
+
+        :param generator: 生成器。
+        :param owner: 脚本所属的组件，需要有_scripts列表。
+        :param runner: 运行此脚本的调度器。
+        """
+        self.generator = generator
+        self.owner = owner
+        self.done = False
+        self.cancelled = False
+        self._runner = runner
+        self._value = None  # 恢复运行时传入生成器的值
+        self._joiners = None  # 等待此脚本结束的脚本
+
+    @property
+    def active(self):
+        """
+        是否还在运行。
+
+        :rtype: bool
+        """
+        return not (self.done or self.cancelled)
+
+    def stop(self):
+        """
+        停止脚本，生成器会被关闭。
+        """
+        if not self.active:
+            return
+        self.cancelled = True
+        try:
+            self.generator.close()
+        except ValueError:  # 脚本停止自己，生成器正在运行
+            pass
+        self._finish()
+
+    def _finish(self):
+        # 从所属组件中移除，并唤醒等待此脚本的脚本
+        if self.owner is not None:
+            try:
+                self.owner._scripts.remove(self)
+            except ValueError:
+                pass
+        joiners, self._joiners = self._joiners, None
+        if joiners and self._runner is not None:
+            self._runner._ready.extend(joiners)
+
+
+class ScriptRunner(object):
+    def __init__(self, clock: Callable[[], float] = time.perf_counter, on_wait_event: Callable[[int], None] = None):
+        """
+        协作式脚本调度器。
+        可以运行的脚本在就绪队列中，等待时间的脚本在按唤醒时间排序的堆中，
+        等待帧数和事件的脚本分别按帧号和事件类型分组，每帧只恢复需要运行的脚本。
+        FastGame.script和Sprite.script使用游戏的调度器，一般不需要直接创建。
+
+        :param clock: 单调时钟，单位为秒。
+        :param on_wait_event: 脚本第一次等待某种事件时调用，传入事件类型。
+        """
+        self._clock = clock
+        self._on_wait_event = on_wait_event
+        self._ready = []  # 下次run时恢复的脚本
+        self._sleeping = []  # (唤醒时间, 序号, 脚本)
+        self._frames = {}  # 帧号 -> 在这一帧恢复的脚本
+        self.waiting = {}  # 事件类型 -> 等待此事件的脚本
+        self.event_types = set()  # 脚本等待过的事件类型
+        self._counter = itertools.count()
+        self._frame = 0  # run的次数
+        self._now = 0.0
+
+    def start(self, generator, owner: Any = None):
+        """
+        启动脚本，脚本在下次run时开始运行。
+
+        :param generator: 生成器。
+        :param owner: 脚本所属的组件，需要有_scripts列表。
+        :return: 脚本。
+        :rtype: Script
+        """
+        if not hasattr(generator, 'send'):
+            raise FastGameError(f'script must be a generator, not {type(generator).__name__}')
+        script = Script(generator, owner, self)
+        if owner is not None:
+            owner._scripts.append(script)
+        self._ready.append(script)
+        return script
+
+    def clear(self):
+        """
+        停止所有脚本。
+        """
+        scripts = self._ready + [entry[2] for entry in self._sleeping]
+        for group in (self._frames, self.waiting):
+            for waiting in group.values():
+                scripts.extend(waiting)
+        self._ready = []
+        self._sleeping = []
+        self._frames.clear()
+        self.waiting.clear()
+        for script in scripts:
+            script.stop()
+
+    def dispatch(self, e):
+        """
+        唤醒等待此事件的脚本，由主循环处理事件时调用。
+
+        :param e: pygame事件。
+        """
+        waiting = self.waiting.pop(e.type, None)
+        if not waiting:
+            return
+        value = Event(e)
+        for script in waiting:
+            if script.active:
+                script._value = value
+                self._ready.append(script)
+
+    def run(self):
+        """
+        恢复所有需要运行的脚本，由主循环每帧调用。
+
+        :return: 恢复的脚本数量。
+        :rtype: int
+        """
+        self._frame += 1
+        frame = self._frame
+        sleeping = self._sleeping
+        if sleeping:
+            now = self._now = self._clock()
+            while sleeping and sleeping[0][0] <= now:
+                self._ready.append(heapq.heappop(sleeping)[2])
+        if self._frames:
+            woken = self._frames.pop(frame, None)
+            if woken:
+                self._ready.extend(woken)
+        if not self._ready:
+            return 0
+        ready, self._ready = self._ready, []
+        count = 0
+        for script in ready:
+            if script.active:
+                self._step(script)
+                count += 1
+        return count
+
+    def _step(self, script: Script):
+        # 运行脚本到下一个yield，并按等待条件放入对应的队列
+        value, script._value = script._value, None
+        try:
+            condition = script.generator.send(value)
+        except StopIteration:
+            self._end(script)
+            return
+        except BaseException:
+            self._end(script)
+            raise
+        if script.cancelled:  # 脚本在运行中停止了自己
+            return
+        if condition is None:
+            self._ready.append(script)
+        elif isinstance(condition, (int, float)):
+            if not self._sleeping:
+                self._now = self._clock()
+            heapq.heappush(self._sleeping, (self._now + condition, next(self._counter), script))
+        elif isinstance(condition, _Frames):
+            if condition.count == 1:
+                self._ready.append(script)
+            else:
+                self._frames.setdefault(self._frame + condition.count, []).append(script)
+        elif isinstance(condition, _EventWait):
+            self.waiting.setdefault(condition.type, []).append(script)
+            if condition.type not in self.event_types:
+                self.event_types.add(condition.type)
+                if self._on_wait_event is not None:
+                    self._on_wait_event(condition.type)
+        elif isinstance(condition, Script):
+            if condition.active:
+                if condition._joiners is None:
+                    condition._joiners = []
+                condition._joiners.append(script)
+            else:
+                self._ready.append(script)
+        else:
+            self._end(script)
+            script.generator.close()
+            raise FastGameError(f'cannot wait for {condition!r}')
+
+    @staticmethod
+    def _end(script: Script):
+        script.done = True
+        script._finish()
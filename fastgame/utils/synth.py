@@ -0,0 +1,217 @@
+"""
+fastgame.utils.synth
+Fastgame音效合成工具，不需要音频文件。
+
+>>> from fastgame import synth
+>>> synth.tone(880, 0.1, wave='square').play()
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from fastgame.locals import *
+from fastgame.exceptions import *
+
+__all__ = ['oscillator', 'envelope', 'white_noise', 'make_sound', 'tone', 'noise', 'clear']
+
+_DTYPES = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32, -32: np.int32}
+_sounds = OrderedDict()  # 参数 -> 合成的Sound
+max_bytes = 32 * 1024 * 1024  # 缓存的内存预算，单位为字节
+_bytes = 0
+
+
+def _mixer():
+    init = pygame.mixer.get_init()
+    if not init:
+        raise EngineError('pygame.mixer is not initialized')
+    return init
+
+
+def oscillator(wave: str, frequency: float, duration: float, rate: int, end_frequency: float = None,
+               duty: float = 0.5):
+    """
+    生成振荡器波形。
+
+    :param wave: 波形，SINE、SQUARE、TRIANGLE或SAWTOOTH。
+    :param frequency: 频率，单位为赫兹。
+    :param duration: 时长，单位为秒。
+    :param rate: 采样率。
+    :param end_frequency: 结束时的频率，指定时频率线性变化(滑音)。
+    :param duty: 方波的占空比。
+    :return: 取值范围为-1~1的采样。
+    :rtype: numpy.ndarray
+    """
+    n = int(duration * rate)
+    if end_frequency is None:
+        phase = np.arange(n, dtype=np.float64) * (frequency / rate)
+    else:
+        phase = np.cumsum(np.linspace(frequency, end_frequency, n) / rate)
+    phase %= 1.0
+    if wave == SINE:
+        samples = np.sin(2 * np.pi * phase)
+    elif wave == SQUARE:
+        samples = np.where(phase < duty, 1.0, -1.0)
+    elif wave == TRIANGLE:
+        samples = 4 * np.abs(phase - 0.5) - 1
+    elif wave == SAWTOOTH:
+        samples = 2 * phase - 1
+    else:
+        raise EngineError(f'waveform not found: {wave}')
+    return samples.astype(np.float32)
+
+
+def envelope(samples: int, rate: int, attack: float = 0.01, decay: float = 0.0, sustain: float = 1.0,
+             release: float = 0.05):
+    """
+    生成ADSR包络。
+
+    :param samples: 采样数。
+    :param rate: 采样率。
+    :param attack: 从0升到最大音量的时长，单位为秒。
+    :param decay: 从最大音量降到sustain的时长，单位为秒。
+    :param sustain: 保持阶段的音量，0~1。
+    :param release: 结束前从sustain降到0的时长，单位为秒。
+    :return: 取值范围为0~1的包络。
+    :rtype: numpy.ndarray
+    """
+    duration = samples / rate
+    attack = min(attack, duration)
+    decay = min(decay, duration - attack)
+    release = min(release, duration - attack - decay)
+    times = [0.0, attack, attack + decay, duration - release, duration]
+    levels = [0.0 if attack else 1.0, 1.0, sustain, sustain, 0.0 if release else sustain]
+    return np.interp(np.arange(samples) / rate, times, levels).astype(np.float32)
+
+
+def white_noise(duration: float, rate: int, frequency: float = None, seed: int = 0):
+    """
+    生成白噪声。
+
+    :param duration: 时长，单位为秒。
+    :param rate: 采样率。
+    :param frequency: 指定时每个随机值保持1/frequency秒，频率越低声音越粗糙(类似红白机的噪声)。
+    :param seed: 随机数种子，相同的参数生成相同的噪声。
+    :return: 取值范围为-1~1的采样。
+    :rtype: numpy.ndarray
+    """
+    n = int(duration * rate)
+    rng = np.random.default_rng(seed)
+    if not frequency:
+        return rng.uniform(-1, 1, n).astype(np.float32)
+    hold = max(int(rate / frequency), 1)
+    return np.repeat(rng.uniform(-1, 1, -(-n // hold)).astype(np.float32), hold)[:n]
+
+
+def make_sound(samples):
+    """
+    将取值范围为-1~1的采样转换为混音器格式的Sound。
+
+    :param samples: 单声道采样。
+    :return: 音效。
+    :rtype: pygame.mixer.Sound
+    """
+    _, size, channels = _mixer()
+    samples = np.clip(samples, -1, 1)
+    dtype = _DTYPES[size]
+    if size == 32:
+        buffer = samples.astype(np.float32)
+    else:
+        bits = abs(size)
+        scale = (1 << (bits - 1)) - 1
+        if size > 0:  # 无符号格式
+            buffer = (samples * scale + (scale + 1)).astype(dtype)
+        else:
+            buffer = (samples * scale).astype(dtype)
+    if channels > 1:
+        buffer = np.repeat(buffer[:, None], channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(buffer))
+
+
+def _cached(key: tuple, render):
+    # 相同参数合成的Sound只生成一次，超出内存预算时淘汰最久未使用的
+    global _bytes
+    key += _mixer()
+    sound = _sounds.get(key)
+    if sound is not None:
+        _sounds.move_to_end(key)
+        return sound
+    sound = _sounds[key] = render()
+    _bytes += _sound_bytes(sound)
+    while _bytes > max_bytes and len(_sounds) > 1:
+        _, old = _sounds.popitem(last=False)
+        _bytes -= _sound_bytes(old)
+    return sound
+
+
+def _sound_bytes(sound: pygame.mixer.Sound):
+    frequency, size, channels = _mixer()
+    return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+
+def tone(frequency: float = 440.0, duration: float = 0.2, wave: str = SQUARE, volume: float = 0.5,
+         end_frequency: float = None, duty: float = 0.5, attack: float = 0.01, decay: float = 0.0,
+         sustain: float = 1.0, release: float = 0.05):
+    """
+    合成一个音调，相同参数的音效直接从缓存中取得。
+
+    >>> synth.tone(220, 0.3, end_frequency=880).play()  # 上升的滑音
+
+    :param frequency: 频率，单位为赫兹。
+    :param duration: 时长，单位为秒。
+    :param wave: 波形，SINE、SQUARE、TRIANGLE或SAWTOOTH。
+    :param volume: 音量，0~1。
+    :param end_frequency: 结束时的频率，指定时频率线性变化。
+    :param duty: 方波的占空比。
+    :param attack: 见envelope。
+    :param decay: 见envelope。
+    :param sustain: 见envelope。
+    :param release: 见envelope。
+    :return: 音效。
+    :rtype: pygame.mixer.Sound
+    """
+    def render():
+        rate = _mixer()[0]
+        samples = oscillator(wave, frequency, duration, rate, end_frequency, duty)
+        samples *= envelope(len(samples), rate, attack, decay, sustain, release)
+        samples *= volume
+        return make_sound(samples)
+
+    return _cached(('tone', frequency, duration, wave, volume, end_frequency, duty,
+                    attack, decay, sustain, release), render)
+
+
+def noise(duration: float = 0.2, volume: float = 0.5, frequency: float = None, attack: float = 0.0,
+          decay: float = 0.0, sustain: float = 1.0, release: float = 0.1, seed: int = 0):
+    """
+    合成噪声(爆炸、打击等)，相同参数的音效直接从缓存中取得。
+
+    :param duration: 时长，单位为秒。
+    :param volume: 音量，0~1。
+    :param frequency: 见white_noise。
+    :param attack: 见envelope。
+    :param decay: 见envelope。
+    :param sustain: 见envelope。
+    :param release: 见envelope。
+    :param seed: 随机数种子。
+    :return: 音效。
+    :rtype: pygame.mixer.Sound
+    """
+    def render():
+        rate = _mixer()[0]
+        samples = white_noise(duration, rate, frequency, seed)
+        samples *= envelope(len(samples), rate, attack, decay, sustain, release)
+        samples *= volume
+        return make_sound(samples)
+
+    return _cached(('noise', duration, volume, frequency, attack, decay, sustain, release, seed), render)
+
+
+def clear():
+    """
+    清空合成音效的缓存。
+    """
+    global _bytes
+    _sounds.clear()
+    _bytes = 0
@@ -0,0 +1,120 @@
+"""
+fastgame.utils.texture
+Fastgame图片缓存工具。
+
+>>> from fastgame import texture
+>>> image = texture.load('test.png', (50, 50))
+"""
+
+import os
+from collections import OrderedDict
+from typing import Tuple, Union
+
+import pygame
+
+__all__ = ['TextureCache', 'cache', 'load', 'clear']
+
+
+def _convert(surface: pygame.Surface):
+    # 转换为窗口的像素格式，绘制时无需逐像素转换
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA or surface.get_colorkey() is not None:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+def _surface_bytes(surface: pygame.Surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class TextureCache(object):
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        """
+        进程内共享的图片缓存，按图片路径和大小缓存。
+        超出内存预算时，淘汰最久未使用的图片。
+        缓存中的图片会被多个角色共享，不要直接在其上绘制。
+
+        :param max_bytes: 内存预算，单位为字节。
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._surfaces = OrderedDict()  # (路径, 大小) -> (修改时间, 图片)
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def __contains__(self, item):
+        return item in self._surfaces
+
+    def load(self, file: str, size: Union[None, Tuple[int, int]] = None):
+        """
+        加载图片，已加载过的图片直接从缓存中取得。
+
+        :param file: 图片路径。
+        :param size: 图片大小，若指定则会将图片缩放。
+        :return: 图片。
+        :rtype: pygame.Surface
+        """
+        file = os.path.abspath(file)
+        key = (file, tuple(size) if size else None)
+        mtime = os.path.getmtime(file)
+        entry = self._surfaces.get(key)
+        if entry is not None and entry[0] == mtime:
+            self._surfaces.move_to_end(key)
+            return entry[1]
+
+        if size:
+            surface = pygame.transform.scale(self.load(file), size)
+        else:
+            surface = _convert(pygame.image.load(file))
+        if entry is not None:
+            self.bytes -= _surface_bytes(entry[1])
+        self._surfaces[key] = (mtime, surface)
+        self._surfaces.move_to_end(key)
+        self.bytes += _surface_bytes(surface)
+        self._evict()
+        return surface
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._surfaces) > 1:
+            _, (_, surface) = self._surfaces.popitem(last=False)
+            self.bytes -= _surface_bytes(surface)
+
+    def set_budget(self, max_bytes: int):
+        """
+        设置内存预算。
+
+        :param max_bytes: 内存预算，单位为字节。
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """
+        清空缓存。
+        """
+        self._surfaces.clear()
+        self.bytes = 0
+
+
+cache = TextureCache()  # 全局图片缓存
+
+
+def load(file: str, size: Union[None, Tuple[int, int]] = None):
+    """
+    从全局图片缓存中加载图片。
+
+    :param file: 图片路径。
+    :param size: 图片大小，若指定则会将图片缩放。
+    :return: 图片。
+    :rtype: pygame.Surface
+    """
+    return cache.load(file, size)
+
+
+def clear():
+    """
+    清空全局图片缓存。
+    """
+    cache.clear()
@@ -3,24 +3,30 @@ fastgame.utils.timer
 Fastgame计时器模块。
 """
 
+import heapq
+import itertools
 import time
-from typing import Union
+from typing import Union, Callable
+
+from fastgame.exceptions import *
+
+__all__ = ['Timer', 'Scheduler', 'ScheduledCall']
 
 
 class Timer(object):
     def __init__(self):
-        self.start = time.time()
+        self.start = time.perf_counter()
         self.on_pause = False
         self.pause_time = 0
         
     def __float__(self):
-        return time.time() - self.start
+        return time.perf_counter() - self.start
     
     def reset(self):
         """
         计时器归零。
         """
-        self.start = time.time()
+        self.start = time.perf_counter()
         
     def get(self, digits: int = 2):
         """
@@ -41,7 +47,7 @@ class Timer(object):
         """
         if self.on_pause:
             return self.pause_time
-        return time.time() - self.start
+        return time.perf_counter() - self.start
     
     def pause(self):
         """
@@ -55,14 +61,174 @@ class Timer(object):
         继续(取消暂停)计时。
         """
         self.on_pause = False
-        self.start = time.time() - self.pause_time
+        self.start = time.perf_counter() - self.pause_time
     
     @staticmethod
     def wait(seconds: Union[int, float]):
         """
         等待一段时间。
+        会阻塞整个主循环，游戏中应使用FastGame.after或FastGame.every。
         
         :param seconds: 等待时间，单位为秒。
         """
         time.sleep(seconds)
+
+
+class ScheduledCall(object):
+    __slots__ = ('due', 'interval', 'callback', 'args', 'cancelled', '_scheduler')
+    
+    def __init__(self, due: float, interval: float, callback: Callable, args: tuple,
+                 scheduler: 'Scheduler' = None):
+        """
+        Scheduler安排的一次(或周期性)调用，由Scheduler.after和Scheduler.every返回。
+        
+        :param due: 下次调用的时间，time.perf_counter()的值。
+        :param interval: 周期，单位为秒，只调用一次时为None。
+        :param callback: 回调函数。
+        :param args: 回调函数的参数。
+        :param scheduler: 安排此调用的调度器。
+        """
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._scheduler = scheduler
+        
+    def cancel(self):
+        """
+        取消调用，之后不再调用回调函数。
+        """
+        if self._scheduler is not None:
+            self._scheduler.cancel(self)
+        else:
+            self.cancelled = True
+        
+    @property
+    def active(self):
+        """
+        是否还会被调用。
+        
+        :rtype: bool
+        """
+        return not self.cancelled
+        
+        
+class Scheduler(object):
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        基于单调时钟和堆的回调调度器，不会阻塞主循环。
+        每次run只取出已到期的调用，未到期的不需要检查。
+        FastGame.after和FastGame.every使用游戏的调度器，一般不需要直接创建。
+        
+        :param clock: 单调时钟，单位为秒。
+        """
+        self._clock = clock
+        self._heap = []  # (到期时间, 序号, ScheduledCall)
+        self._counter = itertools.count()  # 到期时间相同时按安排的顺序调用
+        self._cancelled = 0  # 堆中已取消的调用数，过多时重建堆
+        
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+    
+    def _push(self, call: ScheduledCall):
+        heapq.heappush(self._heap, (call.due, next(self._counter), call))
+        
+    def after(self, ms: Union[int, float], callback: Callable, *args):
+        """
+        在一段时间后调用一次回调函数。
+        
+        :param ms: 延迟，单位为毫秒。
+        :param callback: 回调函数。
+        :param args: 回调函数的参数。
+        :return: 此次调用，可以用于取消。
+        :rtype: ScheduledCall
+        """
+        call = ScheduledCall(self._clock() + max(ms, 0) / 1000, None, callback, args, self)
+        self._push(call)
+        return call
+    
+    def every(self, ms: Union[int, float], callback: Callable, *args):
+        """
+        每隔一段时间调用一次回调函数，直到被取消。
+        落后时不补调用错过的次数，每次run最多调用一次。
+        
+        :param ms: 周期，单位为毫秒，必须大于0。
+        :param callback: 回调函数。
+        :param args: 回调函数的参数。
+        :return: 此次调用，可以用于取消。
+        :rtype: ScheduledCall
+        """
+        if ms <= 0:
+            raise FastGameError('interval must be greater than 0')
+        interval = ms / 1000
+        call = ScheduledCall(self._clock() + interval, interval, callback, args, self)
+        self._push(call)
+        return call
+    
+    def cancel(self, call: ScheduledCall):
+        """
+        取消调用。
+        
+        :param call: after或every返回的调用。
+        """
+        if call.cancelled:
+            return
+        call.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):  # 取消的调用过多，重建堆
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+            
+    def clear(self):
+        """
+        取消所有调用。
+        """
+        for entry in self._heap:
+            entry[2].cancelled = True
+        self._heap.clear()
+        self._cancelled = 0
+        
+    def next_due(self):
+        """
+        距离下一次调用的时间。
+        
+        :return: 单位为秒，没有调用时为None。
+        :rtype: float
+        """
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        if not heap:
+            return None
+        return max(heap[0][0] - self._clock(), 0.0)
     
+    def run(self):
+        """
+        调用所有已到期的回调函数，由主循环每帧调用。
+        
+        :return: 调用的回调函数数量。
+        :rtype: int
+        """
+        heap = self._heap
+        if not heap or heap[0][0] > self._clock():
+            return 0
+        now = self._clock()
+        count = 0
+        while heap and heap[0][0] <= now:
+            _, _, call = heapq.heappop(heap)
+            if call.cancelled:
+                self._cancelled -= 1
+                continue
+            if call.interval is None:
+                call.cancelled = True
+            else:  # 按原来的节拍安排下一次，不累积误差
+                call.due += call.interval
+                if call.due <= now:
+                    call.due += (int((now - call.due) / call.interval) + 1) * call.interval
+                self._push(call)
+            call.callback(*call.args)
+            count += 1
+        return count
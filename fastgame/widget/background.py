@@ -4,8 +4,6 @@ fastgame.widget.background
 Fastgame背景组件。
 """
 
-import pygame
-
 import fastgame
 from fastgame.core.sprite import Sprite
 from fastgame.exceptions import *
@@ -23,11 +21,8 @@ class Background(Sprite):
             raise NotCreatedGameError('did not create FastGame object')
         game = fastgame.games[-1]
         self.screen_rect = game.window.get_rect()
-        super().__init__(image)
+        super().__init__(image, self.screen_rect.size if auto_resize else None)
         self._values = {'image': image, 'auto_resize': auto_resize}
-        if auto_resize:
-            self.width, self.height = self.screen_rect.size
-            self.image = pygame.transform.scale(self.image, (self.width, self.height))
         self.move_to(0, 0)
         
     def rolling_left(self, speed=4):
@@ -5,9 +5,6 @@ Fastgame按钮组件。
 """
 from typing import Tuple, Callable, Any
 
-from pygame.locals import *
-
-import fastgame
 from fastgame.core.sprite import Sprite
 
 __all__ = ['Button']
@@ -42,9 +39,18 @@ class Button(Sprite):
         :rtype: None
         """
         super().update()
-        event = fastgame.games[-1].event
-        if event:
-            if event['type'] == MOUSEBUTTONDOWN and self.collide_mouse():
+        self.check_click()
+        
+    def check_click(self):
+        """
+        检测此按钮是否被按下，若按下则调用回调。
+        读取这一帧的输入状态，同一帧中的每次点击都会调用一次回调。
+        
+        :return: 无。
+        :rtype: None
+        """
+        for button, pos in self.game.input.mouse_downs:
+            if self.rect.collidepoint(pos):
                 self.callback()
     
     def set_command(self, command: Callable[[], Any]):
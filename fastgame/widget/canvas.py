@@ -18,6 +18,7 @@ class Canvas(object):
                  bgcolor: ColorType = BLACK):
         """
         Fastgame画布组件类。
+        差量绘制模式下，画笔的绘制会被记录，并限制在画布范围内。
         
         :param position: 画笔左上角位置。
         :param size: 画布大小。
@@ -28,8 +29,10 @@ class Canvas(object):
         if not fastgame.games:
             raise NotCreatedGameError('did not create FastGame object')
         game = fastgame.games[-1]
+        self.game = game
         self.screen = game.window
         self.get_pen = self.init_pen
+        self._commands = [self.bgcolor]  # 本帧的绘制记录
     
     def update(self):
         """
@@ -39,7 +42,27 @@ class Canvas(object):
         :return: 无。
         :rtype: None
         """
-        pygame.draw.rect(self.screen, self.bgcolor, self.rect)
+        self._commands = [self.bgcolor]
+        self.game.blit(self, self._commands, self.rect.copy())
+        
+    def paint(self, commands: list, rect: pygame.Rect):
+        """
+        按绘制记录绘制画布。
+        底层接口，由FastGame.blit调用。
+        
+        :param commands: 绘制记录。
+        :param rect: 画布位置。
+        """
+        pygame.draw.rect(self.screen, commands[0], rect)
+        for function, args, kwargs in commands[1:]:
+            function(self.screen, *args, **kwargs)
+            
+    def _draw(self, function, *args, **kwargs):
+        # 全部绘制模式下直接绘制，否则记录到本帧的绘制记录中
+        if self.game._render_all:
+            function(self.screen, *args, **kwargs)
+        else:
+            self._commands.append((function, args, kwargs))
     
     def init_pen(self, **kwargs):
         """
@@ -100,7 +123,7 @@ class Pen(object):
                 or x < 0 or y < 0):
             raise OutOfCanvasError(f'position ({x}, {y}) out of canvas')
         if self.pen_down:
-            pygame.draw.line(self.canvas.screen, self.color, (self.x, self.y), (x, y))
+            self.canvas._draw(pygame.draw.line, self.color, (self.x, self.y), (x, y))
         self.x, self.y = x, y
         
     def line(self, x: int, y: int):
@@ -111,7 +134,7 @@ class Pen(object):
         :param y: 另一点Y坐标。
         """
         if self.pen_down:
-            pygame.draw.line(self.canvas.screen, self.color, (self.x, self.y), (x, y))
+            self.canvas._draw(pygame.draw.line, self.color, (self.x, self.y), (x, y))
            
     def circle(self, x: int, y: int, radius: int, fill: bool = True, width: int = 1):
         """
@@ -126,7 +149,7 @@ class Pen(object):
         if fill:
             width = 0
         if self.pen_down:
-            pygame.draw.circle(self.canvas.screen, self.color, (x, y), radius, width=width)
+            self.canvas._draw(pygame.draw.circle, self.color, (x, y), radius, width=width)
     
     def rectangle(self, x: int, y: int, size: Tuple[int, int], fill: bool = True, width: int = 1):
         """
@@ -142,7 +165,7 @@ class Pen(object):
             width = 0
         rect = pygame.rect.Rect(x, y, *size)
         if self.pen_down:
-            pygame.draw.rect(self.canvas.screen, self.color, rect, width=width)
+            self.canvas._draw(pygame.draw.rect, self.color, rect, width=width)
        
     def polygon(self, points: List[Tuple[int, int]], fill: bool = True, width: int = 1):
         """
@@ -158,7 +181,7 @@ class Pen(object):
         if len(points) < 3:
             raise NotPolygonError('not a polygon')
         if self.pen_down:
-            pygame.draw.polygon(self.canvas.screen, self.color, points, width=width)
+            self.canvas._draw(pygame.draw.polygon, self.color, points, width=width)
             
     def fill_screen(self, fill_color: ColorType):
         """
@@ -166,4 +189,4 @@ class Pen(object):
         
         :param fill_color: 填充色。
         """
-        self.canvas.screen.fill(fill_color)
+        self.canvas._draw(pygame.Surface.fill, fill_color)
@@ -49,6 +49,7 @@ class Label(pygame.sprite.Sprite):
         if not fastgame.games:
             raise NotCreatedGameError('did not create FastGame object')
         game = fastgame.games[-1]
+        self.game = game
         self.screen = game.window
         self.image = self.font.render(self.text, antialias, color, bgcolor)
         self.rect = self.image.get_rect()
@@ -74,7 +75,7 @@ class Label(pygame.sprite.Sprite):
         :return: 无。
         :rtype: None
         """
-        self.screen.blit(self.image, self.rect)
+        self.game.blit(self, self.image, self.rect.copy())
         
     def hide(self):
         self._show = False
@@ -136,7 +137,7 @@ class Label(pygame.sprite.Sprite):
         :return: 无。
         :rtype: None
         """
-        self.rect.x, self.rect.y = pygame.mouse.get_pos()
+        self.rect.x, self.rect.y = self.game.input.mouse_pos
         
     def add_x(self, add: int):
         """
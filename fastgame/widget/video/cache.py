@@ -0,0 +1,383 @@
+"""
+fastgame.widget.video.cache
+
+Fastgame视频解码帧缓存
+底层模块
+"""
+
+import bisect
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Callable
+
+import cv2
+import numpy as np
+
+from fastgame.exceptions import *
+from fastgame.utils.diskcache import DiskCache, file_hash
+
+__all__ = ['FrameCache', 'frame_cache', 'convert_frame', 'decode_frames', 'decode_parallel', 'build_index',
+           'seek_frame']
+
+_KEY_FRAME = getattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME', None)  # opencv 4.7以上的FFmpeg后端才支持
+
+
+def convert_frame(frame, size: Tuple[int, int] = None, out=None):
+    """
+    将opencv的BGR帧缩放后转为连续的RGB数组，可以直接用作Surface的缓冲区。
+    
+    :param frame: opencv解码的帧。
+    :param size: 缩放后大小。
+    :param out: 写入结果的数组，形状不同时会创建新数组。
+    :return: RGB帧。
+    :rtype: numpy.ndarray
+    """
+    if size:
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+
+
+def decode_frames(video_file: str, size: Tuple[int, int] = None,
+                  on_frame: Callable[[int], None] = None):
+    """
+    逐帧解码视频，生成连续的RGB数组。
+    
+    :param video_file: 视频文件路径。
+    :param size: 缩放后大小。
+    :param on_frame: 每解码一帧调用一次，参数为已解码的帧数。
+    :return: RGB帧的生成器。
+    :rtype: Generator[numpy.ndarray]
+    """
+    capture = cv2.VideoCapture(video_file)
+    if not capture.isOpened():
+        raise VideoError(f'cannot open video: {video_file}')
+    n = 0
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            if frame is None:  # 空图片，opencv的bug
+                continue
+            yield convert_frame(frame, size)
+            n += 1
+            if on_frame is not None:
+                on_frame(n)
+    finally:
+        capture.release()
+
+
+def decode_parallel(video_file: str, size: Tuple[int, int] = None, workers: int = None,
+                    on_frame: Callable[[int], None] = None, index: dict = None):
+    """
+    使用多个线程并行解码视频。
+    帧范围按关键帧分为若干段，每个线程打开自己的VideoCapture，
+    从段首的关键帧开始解码，缩放后直接写入同一个连续数组。
+    opencv解码和缩放时会释放GIL，解码时间随CPU核数减少。
+    
+    :param video_file: 视频文件路径。
+    :param size: 缩放后大小。
+    :param workers: 线程数，默认为CPU核数。
+    :param on_frame: 每解码一帧调用一次，参数为已解码的帧数，会在解码线程中调用。
+    :param index: build_index取得的帧索引，默认重新扫描视频。
+    :return: 形状为(帧数, 高, 宽, 3)的RGB帧数组。
+    :rtype: numpy.ndarray
+    """
+    if index is None:
+        index = build_index(video_file)
+    capture = cv2.VideoCapture(video_file)
+    if not capture.isOpened():
+        raise VideoError(f'cannot open video: {video_file}')
+    if size:
+        width, height = size
+    else:
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    capture.release()
+    total = index['frames']
+    frames = np.empty((total, height, width, 3), dtype=np.uint8)
+    if not total:
+        return frames
+    
+    keyframes = index['keyframes']
+    workers = max(1, min(workers or os.cpu_count() or 1, total))
+    starts = set()
+    for i in range(workers):
+        start = total * i // workers
+        if keyframes:  # 每段从关键帧开始，跳转后不需要解码前一段的帧
+            start = keyframes[max(bisect.bisect_right(keyframes, start) - 1, 0)]
+        starts.add(start)
+    starts = sorted(starts)
+    ends = starts[1:] + [total]
+    lock = threading.Lock()
+    done = [0]
+    
+    def decode(start: int, end: int):
+        # 解码[start, end)中的帧，返回实际解码到的位置
+        segment = cv2.VideoCapture(video_file)
+        try:
+            if start:
+                seek_frame(segment, start, keyframes)
+            n = start
+            while n < end:
+                ret, frame = segment.read()
+                if not ret:
+                    break
+                if frame is None:  # 空图片，opencv的bug
+                    continue
+                if not np.shares_memory(convert_frame(frame, size, frames[n]), frames):
+                    raise VideoError(f'frame size changed: {frame.shape}')
+                n += 1
+                if on_frame is not None:
+                    with lock:
+                        done[0] += 1
+                        on_frame(done[0])
+            return n
+        finally:
+            segment.release()
+    
+    with ThreadPoolExecutor(len(starts)) as executor:
+        results = list(executor.map(decode, starts, ends))
+    for end, n in zip(ends, results):
+        if n < end:  # 帧数估计偏大时，只保留之前连续的帧
+            return frames[:n]
+    return frames
+
+
+def build_index(video_file: str):
+    """
+    扫描视频的所有数据包(不解码)，建立帧索引。
+    opencv不支持读取数据包时，只记录帧数。
+    
+    :param video_file: 视频文件路径。
+    :return: 帧数frames和按顺序排列的关键帧索引keyframes，无法取得关键帧时keyframes为None。
+    :rtype: dict
+    """
+    capture = cv2.VideoCapture(video_file)
+    if not capture.isOpened():
+        raise VideoError(f'cannot open video: {video_file}')
+    index = {'frames': int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 'keyframes': None}
+    capture.release()
+    if _KEY_FRAME is None:
+        return index
+    # CAP_PROP_FORMAT为-1时，read返回未解码的数据包
+    capture = cv2.VideoCapture(video_file, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not capture.isOpened():
+        return index
+    keyframes = []
+    first = None
+    n = 0
+    try:
+        while capture.grab():
+            if capture.get(_KEY_FRAME) > 0:
+                # 数据包按解码顺序排列，关键帧的位置以显示时间戳为准
+                pts = capture.get(cv2.CAP_PROP_PTS)
+                if pts < 0:
+                    frame = n
+                else:
+                    if first is None:
+                        first = pts
+                    frame = int(round(pts - first))
+                keyframes.append(frame)
+            n += 1
+    finally:
+        capture.release()
+    if n:
+        index['frames'] = n
+    if keyframes and keyframes[0] == 0:
+        index['keyframes'] = sorted(set(keyframes))
+    return index
+
+
+def seek_frame(capture, index: int, keyframes=None):
+    """
+    跳转到某一帧，之后read得到此帧。
+    有关键帧索引时，先跳转到之前最近的关键帧，再向后解码(不转换颜色)到此帧，
+    最多解码一个关键帧间隔；目标帧在当前位置之后且属于同一间隔时，不重新跳转。
+    
+    :param capture: cv2.VideoCapture对象。
+    :param index: 帧索引。
+    :param keyframes: build_index取得的关键帧索引。
+    """
+    if not keyframes:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        return
+    keyframe = keyframes[max(bisect.bisect_right(keyframes, index) - 1, 0)]
+    current = int(capture.get(cv2.CAP_PROP_POS_FRAMES))
+    if not keyframe <= current <= index:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        current = keyframe
+    for _ in range(index - current):
+        if not capture.grab():
+            break
+
+
+class FrameCache(DiskCache):
+    def __init__(self, directory: str = None, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        """
+        视频解码帧的磁盘缓存。
+        按视频文件的指纹(见fastgame.utils.diskcache.file_hash)和缩放后大小保存解码后的RGB帧，
+        之后的播放(包括之后启动的程序)直接用numpy.memmap映射，不再解码。
+        超出磁盘预算时，淘汰最久未使用的整个视频。
+        同时按视频文件的指纹保存帧索引(<指纹>.index)，用于流式播放时跳转。
+
+        :param directory: 缓存文件夹，默认为~/.fastgame/video_cache。
+        :param max_bytes: 磁盘预算，单位为字节。
+        """
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.fastgame', 'video_cache')
+        super().__init__(directory, max_bytes)
+
+    def _key(self, video_file: str, size: Tuple[int, int]):
+        size = f'{size[0]}x{size[1]}' if size else 'source'
+        return f'{file_hash(video_file)}-{size}'
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + '.raw', base + '.json'
+
+    def get(self, video_file: str, size: Tuple[int, int] = None):
+        """
+        取得已缓存的解码帧。
+
+        :param video_file: 视频文件路径。
+        :param size: 视频缩放后大小。
+        :return: 形状为(帧数, 高, 宽, 3)的RGB帧数组，未缓存时为None。
+        :rtype: numpy.memmap
+        """
+        raw, meta = self._paths(self._key(video_file, size))
+        if not (os.path.isfile(raw) and os.path.isfile(meta)):
+            return None
+        with open(meta, 'r', encoding='utf-8') as f:
+            shape = tuple(json.load(f)['shape'])
+        os.utime(meta)  # 记录使用时间，用于LRU淘汰
+        if not shape[0]:
+            return np.zeros(shape, dtype=np.uint8)
+        # 写时复制映射，在帧图片上绘制不会修改缓存文件
+        return np.memmap(raw, dtype=np.uint8, mode='c', shape=shape)
+
+    def load(self, video_file: str, size: Tuple[int, int] = None,
+             on_frame: Callable[[int], None] = None, workers: int = 1):
+        """
+        取得解码帧，未缓存时先解码并写入缓存。
+
+        :param video_file: 视频文件路径。
+        :param size: 视频缩放后大小。
+        :param on_frame: 解码时每解码一帧调用一次，参数为已解码的帧数。
+        :param workers: 解码线程数，为1时边解码边写入磁盘，否则见decode_parallel。
+        :return: 形状为(帧数, 高, 宽, 3)的RGB帧数组。
+        :rtype: numpy.memmap
+        """
+        frames = self.get(video_file, size)
+        if frames is not None:
+            return frames
+        if workers == 1:
+            frames = decode_frames(video_file, size, on_frame)
+        else:
+            frames = decode_parallel(video_file, size, workers, on_frame, self.index(video_file))
+        return self.store(video_file, size, frames)
+
+    def store(self, video_file: str, size: Tuple[int, int], frames):
+        """
+        将解码帧写入缓存。
+
+        :param video_file: 视频文件路径。
+        :param size: 视频缩放后大小。
+        :param frames: 按顺序排列的RGB帧数组。
+        :return: 形状为(帧数, 高, 宽, 3)的RGB帧数组。
+        :rtype: numpy.memmap
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        key = self._key(video_file, size)
+        raw, meta = self._paths(key)
+        shape = None
+        n = 0
+        with open(raw + '.tmp', 'wb') as f:
+            if isinstance(frames, np.ndarray) and frames.ndim == 4:  # 连续数组一次写入
+                f.write(np.ascontiguousarray(frames).data)
+                shape = frames.shape[1:]
+                n = len(frames)
+                frames = ()
+            for frame in frames:
+                if shape is None:
+                    shape = frame.shape
+                elif frame.shape != shape:
+                    raise VideoError(f'frame size changed: {frame.shape}')
+                f.write(np.ascontiguousarray(frame).data)
+                n += 1
+        os.replace(raw + '.tmp', raw)
+        with open(meta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'file': os.path.abspath(video_file), 'shape': (n, ) + tuple(shape or (0, 0, 3))}, f)
+        os.replace(meta + '.tmp', meta)  # 最后写入元数据，保证缓存完整
+        self.evict(keep=key)
+        return self.get(video_file, size)
+
+    def index(self, video_file: str):
+        """
+        取得视频的帧索引，未缓存时先扫描视频并写入缓存。
+        
+        :param video_file: 视频文件路径。
+        :return: 帧数frames和关键帧索引keyframes，见build_index。
+        :rtype: dict
+        """
+        index = self.get_index(video_file)
+        if index is not None:
+            return index
+        index = build_index(video_file)
+        path = os.path.join(self.directory, file_hash(video_file) + '.index')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+        return index
+    
+    def get_index(self, video_file: str):
+        """
+        取得已缓存的帧索引。
+        
+        :param video_file: 视频文件路径。
+        :return: 帧数frames和关键帧索引keyframes，未缓存时为None。
+        :rtype: dict
+        """
+        path = os.path.join(self.directory, file_hash(video_file) + '.index')
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _entry(self, name: str):
+        # 每个缓存的视频对应一个.json元数据文件
+        if not name.endswith('.json'):
+            return None
+        key = name[:-len('.json')]
+        raw, meta = self._paths(key)
+        if not os.path.isfile(raw):
+            return None
+        return key, os.path.getsize(raw), os.path.getmtime(meta)
+
+    def remove(self, key: str):
+        """
+        删除一个缓存的视频。
+
+        :param key: 键。
+        """
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:  # 不存在或正在被使用
+                pass
+
+    def clear(self):
+        """
+        清空缓存。
+        """
+        super().clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.index'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+frame_cache = FrameCache()  # 全局视频缓存
@@ -5,131 +5,374 @@ Fastgame视频组件实现
 底层模块
 """
 
-import glob
-import os
-import random
-import string
-from typing import Tuple
+import queue
+import threading
+import time
+from typing import Tuple, Callable
 
 import cv2
 import pygame
 import tqdm
-from PIL.Image import fromarray
 
 import fastgame
 from fastgame.exceptions import *
+from fastgame.widget.video.cache import frame_cache, convert_frame, decode_parallel, build_index, seek_frame
 
 __all__ = ['Video']
 
 
-def _random_string(length=16):  # 随机字符串
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.sample(chars, length))
-
-
-def _video_to_images(video_file: str, length: int, progress_bar: bool):
-    """
-    视频分解为图片集。
-    内置底层函数。
-    
-    :param video_file: 视频文件路径。
-    :param length: 临时文件夹字符串长度。
-    :param progress_bar: 是否显示tqdm进度条。
-    :return: 图片集路径
-    :rtype: str
-    """
-    temp_folder = os.path.join(os.getcwd(), _random_string(length))
-    os.mkdir(temp_folder)
-    capture = cv2.VideoCapture(video_file)
-    opened = capture.isOpened()
-    
-    tobal = int(capture.get(7))
-    n = 0
-    pb = tqdm.tqdm(total=tobal)
-    
-    while opened:
-        if progress_bar:
-            pb.update()
-        n += 1
-        ret, frame = capture.read()
-        if not ret:
-            break
-        if frame is None:  # 空图片，opencv的bug
-            continue
-        file_path = os.path.join(temp_folder, f'{n}.jpg')
-        # 使用opencv-python，有中文路径时会发生bug
-        # cv2.imwrite(file_path, frame)
-        fromarray(frame).save(file_path)   # 使用pillow解决中文路径问题，但效率下降
-    else:
-        if progress_bar:
-            print('\n')  # tqdm输出导致print函数默认end参数为空字符串
-    
-    capture.release()
-    cv2.destroyAllWindows()
-    return temp_folder
-
-
-def _sort(images: list):  # 将图片集中的图片按序号排序
-    def sort_key(image_file: str):
-        image_file = image_file.replace('\\', '/')
-        image_file = image_file.split('/')[-1]
-        image_file = image_file.replace('.jpg', '')
-        return int(image_file)
-    images.sort(key=sort_key)
-    
-    
 def _get_fps(video_file: str):  # 获取视频FPS
     capture = cv2.VideoCapture(video_file)
     fps = capture.get(cv2.CAP_PROP_FPS)
     return fps
 
 
+def _to_surface(frame):
+    # RGB数组直接包装为Surface，不复制像素
+    height, width = frame.shape[:2]
+    return pygame.image.frombuffer(frame, (width, height), 'RGB')
+
+
+class _StreamDecoder(threading.Thread):
+    def __init__(self, video_file: str, size: Tuple[int, int], start: int, buffer_size: int,
+                 cache: bool = True):
+        """
+        后台解码线程，解码的帧放入有界队列中。
+        到达视频末尾后从头开始。
+        跳转时使用关键帧索引，只解码最近的关键帧之后的帧。
+        没有已缓存的索引时，由另一个线程扫描视频建立索引，建立完成前由opencv自行跳转。
+        内置底层类。
+        
+        :param video_file: 视频文件路径。
+        :param size: 视频缩放后大小。
+        :param start: 开始解码的帧索引。
+        :param buffer_size: 队列最多保存的帧数。
+        :param cache: 是否将帧索引保存到磁盘缓存。
+        """
+        super().__init__(daemon=True)
+        self.capture = cv2.VideoCapture(video_file)
+        if not self.capture.isOpened():
+            raise VideoError(f'cannot open video: {video_file}')
+        self.keyframes = None
+        index = frame_cache.get_index(video_file) if cache else None
+        if index is not None:
+            self.length = index['frames']
+            self.keyframes = index['keyframes']
+        else:
+            self.length = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            threading.Thread(target=self._build_index, args=(video_file, cache), daemon=True).start()
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        if start >= self.length:
+            self.capture.release()
+            raise VideoError(f'length of images is only {self.length}')
+        if start:
+            seek_frame(self.capture, start, self.keyframes)
+        self.size = size
+        self.index = start
+        self.frames = queue.Queue(buffer_size)
+        self.generation = 0  # 每次跳转加一，丢弃跳转前解码的帧
+        self._seek_to = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        
+    def _build_index(self, video_file: str, cache: bool):
+        try:
+            index = frame_cache.index(video_file) if cache else build_index(video_file)
+        except (OSError, VideoError):  # 没有索引时仍然可以跳转
+            return
+        self.keyframes = index['keyframes']
+        
+    def seek(self, index: int):
+        """
+        跳转到某一帧，之后从此帧开始解码。
+        
+        :param index: 帧索引。
+        """
+        with self._lock:
+            self.generation += 1
+            self._seek_to = index
+            
+    def _do_seek(self):
+        with self._lock:
+            index, self._seek_to = self._seek_to, None
+            generation = self.generation
+        if index is not None:
+            seek_frame(self.capture, index, self.keyframes)
+            self.index = index
+        return generation
+        
+    def run(self):
+        while not self._stop_event.is_set():
+            generation = self._do_seek()
+            ret, frame = self.capture.read()
+            if not ret:
+                if self.index == 0:  # 无法解码任何帧
+                    break
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.index = 0
+                continue
+            if frame is None:  # 空图片，opencv的bug
+                continue
+            item = (generation, self.index, convert_frame(frame, self.size))
+            self.index += 1
+            while not self._stop_event.is_set() and self._seek_to is None:
+                try:
+                    self.frames.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        self.capture.release()
+        
+    def get(self, block: bool = False, timeout: float = None):
+        # 取得下一帧的(索引, 帧)，跳过跳转前解码的帧
+        while True:
+            try:
+                generation, index, frame = self.frames.get(block, timeout)
+            except queue.Empty:
+                return None
+            if generation == self.generation:
+                return index, frame
+        
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+
 class Video(object):
     def __init__(self, video_file: str, position: Tuple[int, int] = (0, 0), size: Tuple[int, int] = None,
-                 start: int = 0, set_fps: bool = True, length: int = 16, progress_bar: bool = False):
+                 start: int = 0, set_fps: bool = True, length: int = 16, progress_bar: bool = False,
+                 stream: bool = False, buffer_size: int = 32, cache: bool = True, sync: bool = False,
+                 workers: int = None, progress: Callable[[int, int], None] = None):
         """
         Fastgame视频组件类。
-        加载大视频速度较慢。
-        内部使用opencv+numpy+pillow。
+        第一次加载大视频速度较慢。
+        内部使用opencv+numpy。
+        
+        预先加载时，多个线程分别解码视频的一段，缩放后写入同一个连续数组。
+        
+        解码后的帧保存在磁盘缓存中(见fastgame.widget.video.cache)，
+        之后的播放直接映射缓存文件，不再解码。
+        
+        流式模式下，后台线程边播放边解码，解码的帧保存在有界队列中，
+        直接由numpy数组生成图片，不写入磁盘，启动快且内存占用固定。
+        跳转时只从最近的关键帧开始解码，适合在很长的视频中随意跳转。
+        已缓存的视频在流式模式下直接从缓存中逐帧读取。
+        
+        同步模式下，视频按自己的播放时钟显示对应的帧：游戏循环慢时跳帧，快时保持当前帧，
+        播放速度与窗口FPS无关，也不会修改窗口的FPS。支持暂停、跳转和调整播放速度。
         
         :param video_file: 视频文件路径。
         :param position: 视频左上角相对窗口的位置。
         :param size: 视频缩放后大小。
         :param start: 开始播放时，使用的图片索引。
         :param set_fps: 是否将窗口的FPS设为视频的FPS。
-        :param length: 临时图片集名字符长度。
+        :param length: 已弃用，保留以兼容旧代码。
         :param progress_bar: 是否显示tqdm进度条。
+        :param stream: 是否使用流式模式。
+        :param buffer_size: 流式模式下，预先解码的最多帧数。
+        :param cache: 是否使用磁盘缓存。
+        :param sync: 是否使用同步模式，按播放时钟显示帧。
+        :param workers: 预先加载时的解码线程数，默认为CPU核数。
+        :param progress: 预先加载时每解码一帧调用一次，参数为已解码的帧数和总帧数，会在解码线程中调用。
         """
         if not fastgame.games:
             raise NotCreatedGameError('did not create FastGame object')
         self.game = fastgame.games[-1]
+        self.stream = stream
+        self.decoder = None
+        self.images = None
         
-        self.folder = _video_to_images(video_file, length, progress_bar)
-        self.images = glob.glob(os.path.join(self.folder, '*.jpg'))
-        _sort(self.images)  # 排序，防止Windows下乱序现象
-        temp = []
-        for img in self.images:
-            img = pygame.image.load(img)
-            if size:
-                img = pygame.transform.scale(img, size)
-            temp.append(img)
-            self.width, self.height = img.get_rect().size
-        self.images = temp.copy()
-        
-        if start >= len(self.images):
-            raise VideoError(f'length of images is only {len(self.images)}')
-        self.image = self.images[start]
-        self.index = start
+        frames = frame_cache.get(video_file, size) if cache else None
+        if frames is None and stream:
+            self.decoder = _StreamDecoder(video_file, size, start, buffer_size, cache)
+            self.decoder.start()
+            self.length = self.decoder.length
+            item = self.decoder.get(block=True, timeout=5)
+            if item is None:
+                self.decoder.stop()
+                raise VideoError(f'cannot decode video: {video_file}')
+            self.index, self._frame = item
+            self.image = _to_surface(self._frame)
+            fps = self.decoder.fps
+        else:
+            if frames is None:
+                frames = self._preload(video_file, size, progress_bar, cache, workers, progress)
+            self._frames = frames
+            self.length = len(frames)
+            if start >= self.length:
+                raise VideoError(f'length of images is only {self.length}')
+            if not stream:
+                self.images = [_to_surface(frame) for frame in frames]
+            self.index = start
+            self.image = self._surface(start)
+            fps = _get_fps(video_file)
+            
         self.rect = self.image.get_rect()
         self.rect.x, self.rect.y = position
-        if size:
-            self.width, self.height = size
+        self.width, self.height = self.rect.size
         
-        if set_fps:
-            self.game.fps = _get_fps(video_file)
+        self.fps = fps or 30.0  # 视频FPS，部分视频无法获取
+        self.sync = sync
+        self.paused = False
+        self._rate = 1.0
+        self._base_position = start / self.fps  # 播放时钟
+        self._base_time = time.perf_counter()
+        self._absolute = start  # 从头开始播放的总帧数，循环播放时继续增加
+        self._pending = None  # 同步模式下解码过早的帧
+        if set_fps and not sync:
+            self.game.fps = fps
+            
+    @staticmethod
+    def _preload(video_file: str, size: Tuple[int, int], progress_bar: bool, cache: bool, workers: int,
+                 progress: Callable[[int, int], None]):
+        # 并行解码所有帧，使用缓存时写入磁盘缓存
+        index = frame_cache.index(video_file) if cache else build_index(video_file)
+        total = index['frames']
+        if progress_bar:
+            pb = tqdm.tqdm(total=total)
+        
+        def on_frame(n: int):
+            if progress_bar:
+                pb.update()
+            if progress is not None:
+                progress(n, total)
+        
+        if cache:
+            frames = frame_cache.load(video_file, size, on_frame, workers=workers)
+        else:
+            frames = decode_parallel(video_file, size, workers, on_frame, index)
+        if progress_bar:
+            pb.close()
+        return frames
+    
+    def _surface(self, index: int):
+        # 取得某一帧的图片
+        if self.images is not None:
+            return self.images[index]
+        self._frame = self._frames[index]
+        return _to_surface(self._frame)
             
     def __iter__(self):
-        yield from self.images
+        if self.decoder is not None:
+            raise VideoError('cannot iterate a streaming video')
+        if self.images is not None:
+            yield from self.images
+        else:
+            for index in range(self.length):
+                yield _to_surface(self._frames[index])
+        
+    def close(self):
+        """
+        停止流式模式的后台解码线程，释放视频文件。
+        """
+        if self.decoder is not None:
+            self.decoder.stop()
+        
+    @property
+    def position(self):
+        """
+        播放时钟的当前位置。
+        
+        :return: 当前位置，单位为秒。
+        :rtype: float
+        """
+        if self.paused:
+            return self._base_position
+        return self._base_position + (time.perf_counter() - self._base_time) * self._rate
+    
+    @property
+    def rate(self):
+        return self._rate
+    
+    @rate.setter
+    def rate(self, rate: float):
+        self._rebase(self.position)
+        self._rate = rate
+        
+    def _rebase(self, position: float):
+        self._base_position = position
+        self._base_time = time.perf_counter()
+        
+    def play(self):
+        """
+        继续播放，取消暂停。
+        """
+        if self.paused:
+            self._rebase(self._base_position)
+            self.paused = False
+            
+    def pause(self):
+        """
+        暂停播放。
+        """
+        if not self.paused:
+            self._rebase(self.position)
+            self.paused = True
+            
+    def seek(self, seconds: float):
+        """
+        跳转到某一时间，并立即显示此时间的帧。
+        
+        :param seconds: 时间，单位为秒。
+        """
+        self._rebase(max(seconds, 0.0))
+        self._jump(int(self._base_position * self.fps))
+        
+    def _set_image(self, image: pygame.Surface):
+        temp = self.rect.copy()
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.x, self.rect.y = temp.x, temp.y
+        
+    def _jump(self, absolute: int):
+        # 显示总帧数为absolute的帧
+        index = absolute % self.length
+        self._absolute = absolute
+        if self.decoder is None:
+            self.index = index
+            self._set_image(self._surface(index))
+            return
+        self._pending = None
+        self.decoder.seek(index)
+        item = self.decoder.get(block=True, timeout=5)
+        if item is not None:
+            self.index, self._frame = item
+            self._set_image(_to_surface(self._frame))
+        
+    def sync_frame(self):
+        """
+        显示播放时钟当前位置对应的帧。
+        落后时跳过中间的帧，超前时保持当前帧。
+        同步模式下，update会自动调用此方法。
+        
+        :return: 当前帧索引。
+        :rtype: int
+        """
+        target = int(self.position * self.fps)
+        if target == self._absolute:
+            return self.index
+        if self.decoder is None or target < self._absolute or target - self._absolute > 2 * self.fps:
+            self._jump(target)  # 随机读取，或落后太多时让解码线程跳转
+            return self.index
+        item = None
+        index = self.index
+        while self._absolute < target:
+            next_item = self._pending or self.decoder.get()
+            self._pending = None
+            if next_item is None:  # 解码跟不上时显示已解码的最新帧
+                break
+            step = (next_item[0] - index) % self.length or self.length
+            if self._absolute + step > target:  # 这一帧还没到时间
+                self._pending = next_item
+                break
+            self._absolute += step
+            index = next_item[0]
+            item = next_item
+        if item is not None:
+            self.index, self._frame = item
+            self._set_image(_to_surface(self._frame))
+        return self.index
         
     def update(self):
         """
@@ -139,7 +382,9 @@ class Video(object):
         :return: 无。
         :rtype: None
         """
-        self.game.window.blit(self.image, self.rect)
+        if self.sync:
+            self.sync_frame()
+        self.game.blit(self, self.image, self.rect.copy())
         
     def next(self):
         """
@@ -149,14 +394,22 @@ class Video(object):
         :return: 是否为最后一帧图片。
         :rtype: bool
         """
-        temp = self.rect.copy()
+        if self.decoder is not None:
+            item = self._pending or self.decoder.get()
+            self._pending = None
+            if item is None:  # 解码跟不上时保持当前帧
+                return False
+            result = item[0] < self.index
+            self._absolute += (item[0] - self.index) % self.length or self.length
+            self.index, self._frame = item
+            self._set_image(_to_surface(self._frame))
+            return result
         self.index += 1
-        if self.index >= len(self.images):
+        self._absolute += 1
+        if self.index >= self.length:
             self.index = 0
             result = True
         else:
             result = False
-        self.image = self.images[self.index]
-        self.rect = self.image.get_rect()
-        self.rect.x, self.rect.y = temp.x, temp.y
+        self._set_image(self._surface(self.index))
         return result
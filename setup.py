@@ -19,6 +19,6 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    install_requires=['pygame>=2.1.0', 'arrow', 'opencv-python', 'tqdm', 'pillow'],
+    install_requires=['pygame>=2.1.0', 'arrow', 'opencv-python', 'tqdm', 'numpy'],
     python_requires='>=3.6',
 )